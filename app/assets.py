@@ -0,0 +1,116 @@
+# app/assets.py
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from app.compresion import brotli, codificaciones_aceptadas
+
+# Tipos que merece la pena comprimir (las imágenes ya van comprimidas)
+EXTENSIONES_COMPRIMIBLES = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map"}
+
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+
+
+# -------------------------
+# ASSET PRECOMPRIMIDO
+# -------------------------
+class Asset:
+    def __init__(self, ruta: str, contenido: bytes):
+        self.ruta = ruta
+        self.huella = hashlib.sha256(contenido).hexdigest()[:12]
+        base, extension = os.path.splitext(ruta)
+        self.ruta_huella = f"{base}.{self.huella}{extension}"
+        self.media_type = mimetypes.guess_type(ruta)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/") or self.media_type == "application/javascript":
+            self.media_type += "; charset=utf-8"
+
+        # {codificación: cuerpo}; solo se guardan las variantes que ocupan menos
+        self.variantes = {"identity": contenido}
+        if extension in EXTENSIONES_COMPRIMIBLES:
+            comprimido = gzip.compress(contenido, compresslevel=9, mtime=0)
+            if len(comprimido) < len(contenido):
+                self.variantes["gzip"] = comprimido
+            if brotli is not None:
+                comprimido = brotli.compress(contenido, quality=11)
+                if len(comprimido) < len(contenido):
+                    self.variantes["br"] = comprimido
+
+    # Elige br, gzip o sin comprimir según Accept-Encoding
+    def elegir_variante(self, accept_encoding: str) -> str:
+        aceptadas = codificaciones_aceptadas(accept_encoding)
+        for codificacion in ("br", "gzip"):
+            if codificacion in self.variantes and (codificacion in aceptadas or "*" in aceptadas):
+                return codificacion
+        return "identity"
+
+
+# -------------------------
+# PIPELINE DE ASSETS
+# -------------------------
+# Recorre el directorio al arrancar, calcula la huella de cada fichero y
+# guarda en memoria sus variantes gzip/brotli.
+class AssetPipeline:
+    def __init__(self, directorio: str, prefijo: str = "/static"):
+        self.directorio = directorio
+        self.prefijo = prefijo
+        self.por_ruta = {}
+        self.por_huella = {}
+
+    def construir(self):
+        por_ruta = {}
+        for raiz, _, ficheros in os.walk(self.directorio):
+            for fichero in ficheros:
+                completo = os.path.join(raiz, fichero)
+                ruta = os.path.relpath(completo, self.directorio).replace(os.sep, "/")
+                with open(completo, "rb") as f:
+                    por_ruta[ruta] = Asset(ruta, f.read())
+        self.por_ruta = por_ruta
+        self.por_huella = {asset.ruta_huella: asset for asset in por_ruta.values()}
+        return self
+
+    # URL con huella para usar en las plantillas: {{ static_url('js/main.js') }}
+    def url(self, ruta: str) -> str:
+        asset = self.por_ruta.get(ruta.lstrip("/"))
+        return f"{self.prefijo}/{asset.ruta_huella if asset else ruta.lstrip('/')}"
+
+    def respuesta(self, ruta: str, cabeceras_peticion) -> Response:
+        asset = self.por_huella.get(ruta)
+        inmutable = asset is not None
+        if asset is None:
+            asset = self.por_ruta.get(ruta)
+        if asset is None:
+            return None
+
+        codificacion = asset.elegir_variante(cabeceras_peticion.get("accept-encoding", ""))
+        etag = f'"{asset.huella}-{codificacion}"'
+        cabeceras = {
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+            # Con huella se puede cachear para siempre; sin ella, revalidar siempre
+            "Cache-Control": CACHE_INMUTABLE if inmutable else "no-cache",
+        }
+        if codificacion != "identity":
+            cabeceras["Content-Encoding"] = codificacion
+
+        if etag in cabeceras_peticion.get("if-none-match", ""):
+            return Response(status_code=304, headers=cabeceras)
+        return Response(asset.variantes[codificacion], media_type=asset.media_type, headers=cabeceras)
+
+
+# StaticFiles que sirve primero los assets del pipeline (con huella y
+# precomprimidos) y deja el resto al comportamiento normal
+class AssetStaticFiles(StaticFiles):
+    def __init__(self, *args, pipeline: AssetPipeline, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pipeline = pipeline
+
+    async def get_response(self, path: str, scope):
+        if scope["method"] in ("GET", "HEAD"):
+            cabeceras = {clave.decode("latin-1"): valor.decode("latin-1") for clave, valor in scope["headers"]}
+            respuesta = self.pipeline.respuesta(path.replace(os.sep, "/"), cabeceras)
+            if respuesta is not None:
+                return respuesta
+        return await super().get_response(path, scope)
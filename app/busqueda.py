@@ -0,0 +1,80 @@
+# app/busqueda.py
+from bisect import bisect_left
+from collections import defaultdict
+import math
+import re
+import unicodedata
+
+# -------------------------
+# NORMALIZACIÓN DE TEXTO
+# -------------------------
+
+# Minúsculas y sin tildes: "Programación" -> "programacion"
+def normalizar(texto: str) -> str:
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+def tokenizar(texto: str) -> list:
+    return re.findall(r"\w+", normalizar(texto))
+
+
+# -------------------------
+# ÍNDICE INVERTIDO EN MEMORIA
+# -------------------------
+# Índice de términos -> {id: peso} construido a partir de una lista de
+# objetos. Los términos se guardan también ordenados para encontrar por
+# bisección los que empiezan por un prefijo (búsqueda mientras se escribe).
+# Puntuación: suma por cada término buscado del peso del campo (p. ej. el
+# nombre cuenta más que la descripción) por la frecuencia y el idf. Un
+# término que solo coincide como prefijo puntúa la mitad.
+class IndiceInvertido:
+    def __init__(self, objetos, campos: dict):
+        self.objetos = {obj.id: obj for obj in objetos}
+        self._postings = defaultdict(lambda: defaultdict(float))
+        for obj in objetos:
+            for campo, peso in campos.items():
+                for termino in tokenizar(getattr(obj, campo)):
+                    self._postings[termino][obj.id] += peso
+        self._terminos = sorted(self._postings)
+
+    def _idf(self, termino: str) -> float:
+        return math.log(1 + len(self.objetos) / len(self._postings[termino]))
+
+    def _terminos_con_prefijo(self, prefijo: str):
+        i = bisect_left(self._terminos, prefijo)
+        while i < len(self._terminos) and self._terminos[i].startswith(prefijo):
+            yield self._terminos[i]
+            i += 1
+
+    # Puntuación de un término buscado: coincidencia exacta o por prefijo
+    def _puntuar_termino(self, buscado: str) -> dict:
+        puntuaciones = defaultdict(float)
+        for termino in self._terminos_con_prefijo(buscado):
+            factor = 1.0 if termino == buscado else 0.5
+            idf = self._idf(termino)
+            for obj_id, peso in self._postings[termino].items():
+                puntuaciones[obj_id] = max(puntuaciones[obj_id], peso * idf * factor)
+        return puntuaciones
+
+    # Objetos que contienen todos los términos (o prefijos), de mayor a menor
+    # puntuación; a igualdad, por id
+    def buscar(self, consulta: str, filtro=None) -> list:
+        terminos = list(dict.fromkeys(tokenizar(consulta)))
+        if not terminos:
+            return []
+
+        total = None
+        for termino in terminos:
+            puntuaciones = self._puntuar_termino(termino)
+            if total is None:
+                total = puntuaciones
+            else:
+                total = {obj_id: total[obj_id] + p for obj_id, p in puntuaciones.items() if obj_id in total}
+            if not total:
+                return []
+
+        resultados = [self.objetos[obj_id] for obj_id in total]
+        if filtro is not None:
+            resultados = [obj for obj in resultados if filtro(obj)]
+        resultados.sort(key=lambda obj: (-total[obj.id], obj.id))
+        return resultados
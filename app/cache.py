@@ -0,0 +1,140 @@
+# app/cache.py
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+# -------------------------
+# CACHÉ LRU CON EXPIRACIÓN (TTL)
+# -------------------------
+# Caché en memoria del proceso, acotada en número de entradas y con
+# caducidad por entrada. Es segura entre hilos porque las rutas síncronas
+# de FastAPI se ejecutan en el threadpool.
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expira = item
+            if expira <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expira)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+            }
+
+
+# -------------------------
+# CACHÉ LIGADA A UN SELLO DE VERSIÓN
+# -------------------------
+# Las entradas se guardan junto a la versión del sello (tabla versiones) con
+# la que se calcularon, así que en cuanto cambia el sello dejan de servirse.
+# - Escrituras en este worker: se invalida al hacer commit (ver app.catalogo).
+# - Escrituras en otros workers: se detectan al consultar el sello, como
+#   mucho cada `intervalo` segundos.
+# `leer_version(db)` devuelve (valor, fecha_modificacion) del sello.
+class CacheVersionada:
+    def __init__(self, leer_version, maxsize: int, intervalo: float, ttl: float = 3600):
+        self.leer_version = leer_version
+        self.intervalo = intervalo
+        self._entradas = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = Lock()
+        self.version = None
+        self.fecha = None
+        self._comprobado = 0.0
+        self.consultas_version = 0
+        self.invalidaciones_locales = 0
+        self.invalidaciones_remotas = 0
+
+    # Versión conocida si aún no toca volver a consultar el sello; si no, None
+    def version_vigente(self):
+        if time.monotonic() - self._comprobado < self.intervalo and self.version is not None:
+            return self.version
+        return None
+
+    # Versión vigente del sello; solo consulta la BD si ha pasado el intervalo
+    def version_actual(self, db):
+        if self.version_vigente() is not None:
+            return self.version, self.fecha
+        version, fecha = self.leer_version(db)
+        return self.registrar_version(version, fecha)
+
+    # Apunta la versión leída del sello (para quien la lee por su cuenta, p. ej.
+    # con una sesión async) y descarta las entradas si ha cambiado
+    def registrar_version(self, version, fecha):
+        with self._lock:
+            self.consultas_version += 1
+            if self.version is not None and version != self.version:
+                self.invalidaciones_remotas += 1
+                self._entradas.clear()
+            self.version, self.fecha = version, fecha
+            self._comprobado = time.monotonic()
+        return version, fecha
+
+    def get(self, version, clave):
+        return self._entradas.get((version, clave))
+
+    def set(self, version, clave, valor):
+        self._entradas.set((version, clave), valor)
+
+    def delete(self, clave):
+        self._entradas.delete((self.version, clave))
+
+    # Fuerza a releer el sello en la próxima petición
+    def invalidar(self):
+        with self._lock:
+            self.invalidaciones_locales += 1
+            self.version = None
+            self._comprobado = 0.0
+            self._entradas.clear()
+
+    def stats(self) -> dict:
+        datos = self._entradas.stats()
+        datos.update({
+            "version": self.version,
+            "segundos_desde_comprobacion": (time.monotonic() - self._comprobado) if self._comprobado else None,
+            "intervalo_comprobacion": self.intervalo,
+            "consultas_version": self.consultas_version,
+            "invalidaciones_locales": self.invalidaciones_locales,
+            "invalidaciones_remotas": self.invalidaciones_remotas,
+        })
+        return datos
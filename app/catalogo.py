@@ -0,0 +1,153 @@
+# app/catalogo.py
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+import os
+
+from app import crud, models, schemas
+from app.busqueda import IndiceInvertido
+from app.cache import CacheVersionada
+from app.database import SessionLocal
+
+# -------------------------
+# CARGAR VARIABLES DE ENTORNO
+# -------------------------
+load_dotenv()
+
+# Cada cuántos segundos se consulta el sello "catalogo" en la BD. Es el
+# retraso máximo con el que un worker ve los cambios hechos por otro.
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", "2"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "256"))
+
+
+# -------------------------
+# CACHÉ DEL CATÁLOGO DE CURSOS
+# -------------------------
+# Entradas ligadas al sello "catalogo" (ver app.cache.CacheVersionada)
+catalogo_cache = CacheVersionada(
+    lambda db: crud.get_version(db, "catalogo"), CATALOG_CACHE_SIZE, CATALOG_POLL_INTERVAL
+)
+
+# Los contadores de inscritos/completados cambian con cada inscripción, así
+# que van en su propio sello "contadores": si cambiaran el del catálogo,
+# cada inscripción tiraría la caché de cursos, los fragmentos y el índice de
+# búsqueda. Aquí solo se guarda lo que incluye contadores.
+contadores_cache = CacheVersionada(
+    lambda db: crud.get_version(db, "contadores"), CATALOG_CACHE_SIZE, CATALOG_POLL_INTERVAL
+)
+
+# ((versión del catálogo, versión de los contadores), fecha del último cambio)
+def versiones_catalogo(db: Session):
+    version, fecha = catalogo_cache.version_actual(db)
+    version_contadores, fecha_contadores = contadores_cache.version_actual(db)
+    fechas = [f for f in (fecha, fecha_contadores) if f is not None]
+    return (version, version_contadores), max(fechas) if fechas else None
+
+
+# -------------------------
+# CATÁLOGO Y FRAGMENTOS PARA RENDERIZAR EN EL SERVIDOR
+# -------------------------
+
+# Todos los cursos (CursoOut, ordenados por id) de la versión vigente.
+# Sus contadores son los del momento en que se cargaron: para mostrarlos
+# hay que pasar los cursos por con_contadores.
+def cursos_catalogo(db: Session):
+    version, _ = catalogo_cache.version_actual(db)
+    cursos = catalogo_cache.get(version, ("todos",))
+    if cursos is None:
+        filas = crud.query_cursos(db).order_by(models.Curso.id).all()
+        cursos = [schemas.CursoOut.model_validate(curso) for curso in filas]
+        catalogo_cache.set(version, ("todos",), cursos)
+    return cursos
+
+# Índice de búsqueda de cursos de la versión vigente. Se reconstruye cuando
+# cambia el sello "catalogo", así que sigue a todas las rutas que escriben cursos.
+def indice_cursos(db: Session) -> IndiceInvertido:
+    version, _ = catalogo_cache.version_actual(db)
+    indice = catalogo_cache.get(version, ("indice_busqueda",))
+    if indice is None:
+        indice = IndiceInvertido(cursos_catalogo(db), {"nombre": 3.0, "descripcion": 1.0})
+        catalogo_cache.set(version, ("indice_busqueda",), indice)
+    return indice
+
+# {id_curso: (total_inscritos, total_completados)} de la versión vigente de
+# los contadores (una consulta de tres columnas cada vez que cambian)
+def contadores_cursos(db: Session) -> dict:
+    version, _ = contadores_cache.version_actual(db)
+    contadores = contadores_cache.get(version, ("todos",))
+    if contadores is None:
+        filas = db.query(models.Curso.id, models.Curso.total_inscritos, models.Curso.total_completados).all()
+        contadores = {id_curso: (inscritos, completados) for id_curso, inscritos, completados in filas}
+        contadores_cache.set(version, ("todos",), contadores)
+    return contadores
+
+# Copias de los cursos (CursoOut) con los contadores vigentes
+def con_contadores(db: Session, cursos: list) -> list:
+    contadores = contadores_cursos(db)
+    copias = []
+    for curso in cursos:
+        inscritos, completados = contadores.get(curso.id, (curso.total_inscritos, curso.total_completados))
+        copias.append(curso.model_copy(update={"total_inscritos": inscritos, "total_completados": completados}))
+    return copias
+
+# HTML de un fragmento cacheado por versión del catálogo. `render` recibe
+# la lista de cursos y solo se llama si el fragmento no está en caché. Con
+# contadores=True el fragmento muestra contadores, así que se guarda por
+# versión del catálogo y de los contadores.
+def fragmento_catalogo(db: Session, clave, render, contadores: bool = False):
+    version, _ = catalogo_cache.version_actual(db)
+    if not contadores:
+        html = catalogo_cache.get(version, ("fragmento", clave))
+        if html is None:
+            html = render(cursos_catalogo(db))
+            catalogo_cache.set(version, ("fragmento", clave), html)
+        return html
+
+    version_contadores, _ = contadores_cache.version_actual(db)
+    html = contadores_cache.get(version_contadores, ("fragmento", clave, version))
+    if html is None:
+        html = render(con_contadores(db, cursos_catalogo(db)))
+        contadores_cache.set(version_contadores, ("fragmento", clave, version), html)
+    return html
+
+
+# Descarta las entradas locales de los sellos que ha cambiado este worker
+def _invalidar_sellos(versiones):
+    if "catalogo" in versiones:
+        catalogo_cache.invalidar()
+    if "contadores" in versiones:
+        contadores_cache.invalidar()
+
+# crud.bump_version apunta en session.info qué sellos ha cambiado la transacción
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidar_tras_commit(session):
+    versiones = session.info.pop("versiones_modificadas", None)
+    if versiones:
+        _invalidar_sellos(versiones)
+    # Los de crud.bump_version_tras_commit se publican al cerrar la transacción
+    diferidas = session.info.pop("versiones_tras_commit", None)
+    if diferidas:
+        session.info.setdefault("versiones_por_publicar", set()).update(diferidas)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_tras_rollback(session):
+    session.info.pop("versiones_modificadas", None)
+    session.info.pop("versiones_tras_commit", None)
+
+# En after_commit la sesión aún tiene su conexión; aquí ya la ha devuelto al
+# pool, así que publicar el sello no ocupa una segunda conexión a la vez
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _publicar_tras_transaccion(session, transaction):
+    if transaction.parent is not None:
+        return
+    versiones = session.info.pop("versiones_por_publicar", None)
+    if not versiones:
+        return
+    try:
+        crud.publicar_versiones(session.get_bind(), versiones)
+    except SQLAlchemyError as e:
+        # Los datos ya están guardados: el resto de workers verá los
+        # contadores nuevos con el siguiente cambio del sello
+        print(f"Error al publicar los sellos {sorted(versiones)}: {str(e)}")
+    _invalidar_sellos(versiones)
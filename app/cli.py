@@ -0,0 +1,106 @@
+# app/cli.py
+# Comandos de mantenimiento. Uso (desde la raíz del proyecto):
+#   python -m app.cli reconciliar-contadores
+#   python -m app.cli migrar [--estado]
+#   python -m app.cli comprobar-indices
+#   python -m app.cli calibrar-bcrypt --objetivo-ms 250
+#   python -m app.cli purgar-refresh-tokens
+import argparse
+import sys
+
+from app import crud, migraciones, planes
+from app.hashing import BCRYPT_ROUNDS, calibrar
+from app.database import SessionLocal
+
+
+# Recalcula total_inscritos / total_completados de todos los cursos
+def reconciliar_contadores(args):
+    db = SessionLocal()
+    try:
+        cursos = crud.reconciliar_contadores(db)
+        print(f"Contadores recalculados en {cursos} cursos")
+    finally:
+        db.close()
+
+
+# Aplica las migraciones de esquema pendientes (o solo las lista con --estado)
+def migrar(args):
+    if args.estado:
+        for version, nombre, aplicada in migraciones.estado():
+            print(f"{version:>4}  {'aplicada ' if aplicada else 'pendiente'}  {nombre}")
+        return
+
+    aplicadas = migraciones.migrar()
+    for version, nombre in aplicadas:
+        print(f"Aplicada {version}: {nombre}")
+    if not aplicadas:
+        print("El esquema está al día")
+
+# EXPLAIN de las consultas frecuentes; termina con error si alguna no usa índice
+def comprobar_indices(args):
+    fallos = 0
+    for nombre, tabla, usa_indice, plan in planes.comprobar_indices():
+        print(f"[{'OK' if usa_indice else 'SIN ÍNDICE'}] {nombre} ({tabla})")
+        for linea in plan:
+            print(f"    {linea}")
+        fallos += not usa_indice
+    if fallos:
+        sys.exit(1)
+
+# Mide el coste de bcrypt en esta máquina y recomienda BCRYPT_ROUNDS
+def calibrar_bcrypt(args):
+    mediciones, recomendadas = calibrar(args.objetivo_ms, args.minimo, args.maximo)
+    for rondas, ms in mediciones:
+        marca = "  <- recomendado" if rondas == recomendadas else ""
+        print(f"rondas={rondas:>2}  {ms:8.1f} ms/hash{marca}")
+    print(f"Objetivo: {args.objetivo_ms:.0f} ms. Actual: BCRYPT_ROUNDS={BCRYPT_ROUNDS}. Recomendado: BCRYPT_ROUNDS={recomendadas}")
+    print("Los hashes existentes se rehacen con el nuevo coste en el siguiente login de cada usuario.")
+
+# Borra los refresh tokens caducados o de sesiones cerradas (p. ej. desde cron)
+def purgar_refresh_tokens(args):
+    db = SessionLocal()
+    try:
+        borrados = crud.purgar_refresh_tokens(db)
+        print(f"Refresh tokens borrados: {borrados}")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Comandos de mantenimiento")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    subparsers.add_parser(
+        "reconciliar-contadores",
+        help="Recalcula los contadores de inscripciones de cada curso"
+    ).set_defaults(func=reconciliar_contadores)
+
+    parser_migrar = subparsers.add_parser("migrar", help="Aplica las migraciones de esquema pendientes")
+    parser_migrar.add_argument("--estado", action="store_true", help="Solo lista las migraciones y si están aplicadas")
+    parser_migrar.set_defaults(func=migrar)
+
+    subparsers.add_parser(
+        "comprobar-indices",
+        help="Comprueba con EXPLAIN que las consultas frecuentes usan índices"
+    ).set_defaults(func=comprobar_indices)
+
+    parser_calibrar = subparsers.add_parser(
+        "calibrar-bcrypt",
+        help="Mide el coste de bcrypt frente a un objetivo de ms por hash"
+    )
+    parser_calibrar.add_argument("--objetivo-ms", type=float, default=250, help="Tiempo máximo por hash (ms)")
+    parser_calibrar.add_argument("--minimo", type=int, default=8, help="Coste mínimo a probar")
+    parser_calibrar.add_argument("--maximo", type=int, default=16, help="Coste máximo a probar")
+    parser_calibrar.set_defaults(func=calibrar_bcrypt)
+
+    subparsers.add_parser(
+        "purgar-refresh-tokens",
+        help="Borra los refresh tokens caducados o de sesiones ya cerradas"
+    ).set_defaults(func=purgar_refresh_tokens)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
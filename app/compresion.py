@@ -0,0 +1,206 @@
+# app/compresion.py
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+import gzip
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se usa gzip
+    brotli = None
+
+# -------------------------
+# CARGAR VARIABLES DE ENTORNO
+# -------------------------
+load_dotenv()
+
+# Respuestas más pequeñas que esto se envían sin comprimir (bytes)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Nivel de gzip (1-9) y calidad de brotli (0-11)
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Cuerpos a partir de este tamaño se comprimen en el threadpool para no
+# bloquear el event loop (bytes)
+COMPRESSION_THREAD_SIZE = int(os.getenv("COMPRESSION_THREAD_SIZE", "65536"))
+# Tipos de contenido que se comprimen
+COMPRESSION_TYPES = [
+    tipo.strip() for tipo in os.getenv(
+        "COMPRESSION_TYPES",
+        "text/html,text/css,text/plain,text/csv,text/javascript,application/javascript,"
+        "application/json,application/x-ndjson,application/xml,image/svg+xml"
+    ).split(",") if tipo.strip()
+]
+
+
+# -------------------------
+# COMPRESORES
+# -------------------------
+# Interfaz común: compress(trozo) devuelve lo que se puede enviar ya (con
+# flush para no retener datos de un StreamingResponse) y finish() el resto.
+class _CompresorGzip:
+    def __init__(self, nivel: int):
+        self._c = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, datos: bytes) -> bytes:
+        return self._c.compress(datos) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.flush(zlib.Z_FINISH)
+
+
+class _CompresorBrotli:
+    def __init__(self, calidad: int):
+        self._c = brotli.Compressor(quality=calidad)
+
+    def compress(self, datos: bytes) -> bytes:
+        return self._c.process(datos) + self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+def comprimir(codificacion: str, datos: bytes, nivel: int, calidad_brotli: int) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(datos, quality=calidad_brotli)
+    return gzip.compress(datos, compresslevel=nivel, mtime=0)
+
+
+# Codificaciones aceptadas en Accept-Encoding (sin las marcadas con q=0)
+def codificaciones_aceptadas(accept_encoding: str) -> set:
+    aceptadas = set()
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        if parametros.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        aceptadas.add(nombre.strip())
+    return aceptadas
+
+def elegir_codificacion(accept_encoding: str) -> str:
+    aceptadas = codificaciones_aceptadas(accept_encoding)
+    if brotli is not None and "br" in aceptadas:
+        return "br"
+    if "gzip" in aceptadas:
+        return "gzip"
+    return None
+
+
+def _cabecera(cabeceras, nombre: bytes):
+    for clave, valor in cabeceras:
+        if clave.lower() == nombre:
+            return valor.decode("latin-1")
+    return None
+
+def _sin_cabeceras(cabeceras, *nombres: bytes):
+    return [(clave, valor) for clave, valor in cabeceras if clave.lower() not in nombres]
+
+def _con_vary(cabeceras):
+    vary = _cabecera(cabeceras, b"vary")
+    if vary is None:
+        return cabeceras + [(b"vary", b"Accept-Encoding")]
+    if "accept-encoding" in vary.lower() or vary.strip() == "*":
+        return cabeceras
+    return _sin_cabeceras(cabeceras, b"vary") + [(b"vary", f"{vary}, Accept-Encoding".encode("latin-1"))]
+
+
+# -------------------------
+# MIDDLEWARE DE COMPRESIÓN (ASGI)
+# -------------------------
+# Comprime con br/gzip las respuestas dinámicas cuyo tipo está en la lista.
+# - Cuerpo completo: solo si supera el tamaño mínimo.
+# - StreamingResponse: se comprime trozo a trozo con flush.
+# - Respuestas que ya traen Content-Encoding (assets precomprimidos) no se tocan.
+# Los ETag fuertes pasan a débiles (W/) al comprimir, que es lo que exige el
+# RFC para una representación distinta; app.http_cache compara en modo débil.
+class CompresionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, level: int = COMPRESSION_LEVEL,
+                 brotli_quality: int = COMPRESSION_BROTLI_QUALITY, content_types=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.content_types = content_types or COMPRESSION_TYPES
+
+    def _comprimible(self, cabeceras, status: int) -> bool:
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if _cabecera(cabeceras, b"content-encoding") is not None:
+            return False
+        tipo = (_cabecera(cabeceras, b"content-type") or "").split(";")[0].strip().lower()
+        return tipo in self.content_types
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cabeceras_peticion = dict(scope["headers"])
+        codificacion = elegir_codificacion(cabeceras_peticion.get(b"accept-encoding", b"").decode("latin-1"))
+        estado = {"inicio": None, "compresor": None, "pasar": False}
+
+        async def send_comprimido(message):
+            if message["type"] == "http.response.start":
+                estado["inicio"] = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            inicio = estado["inicio"]
+            if inicio is not None:
+                # Primer trozo del cuerpo: decidir si se comprime
+                estado["inicio"] = None
+                cabeceras = list(inicio.get("headers", []))
+                cuerpo = message.get("body", b"")
+                mas = message.get("more_body", False)
+
+                if not self._comprimible(cabeceras, inicio["status"]):
+                    estado["pasar"] = True
+                    await send(inicio)
+                    await send(message)
+                    return
+
+                cabeceras = _con_vary(cabeceras)
+                if codificacion is None or (not mas and len(cuerpo) < self.minimum_size):
+                    estado["pasar"] = True
+                    await send({**inicio, "headers": cabeceras})
+                    await send(message)
+                    return
+
+                cabeceras = _sin_cabeceras(cabeceras, b"content-length", b"etag")
+                etag = _cabecera(inicio.get("headers", []), b"etag")
+                if etag is not None:
+                    cabeceras.append((b"etag", (etag if etag.startswith("W/") else f"W/{etag}").encode("latin-1")))
+                cabeceras.append((b"content-encoding", codificacion.encode("latin-1")))
+
+                if not mas:
+                    if len(cuerpo) >= COMPRESSION_THREAD_SIZE:
+                        comprimido = await run_in_threadpool(comprimir, codificacion, cuerpo, self.level, self.brotli_quality)
+                    else:
+                        comprimido = comprimir(codificacion, cuerpo, self.level, self.brotli_quality)
+                    cabeceras.append((b"content-length", str(len(comprimido)).encode("latin-1")))
+                    await send({**inicio, "headers": cabeceras})
+                    await send({"type": "http.response.body", "body": comprimido})
+                    return
+
+                estado["compresor"] = (
+                    _CompresorBrotli(self.brotli_quality) if codificacion == "br" else _CompresorGzip(self.level)
+                )
+                await send({**inicio, "headers": cabeceras})
+                await send({"type": "http.response.body", "body": estado["compresor"].compress(cuerpo), "more_body": True})
+                return
+
+            if estado["pasar"]:
+                await send(message)
+                return
+
+            compresor = estado["compresor"]
+            datos = compresor.compress(message.get("body", b""))
+            if message.get("more_body", False):
+                if datos:
+                    await send({"type": "http.response.body", "body": datos, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": datos + compresor.finish()})
+
+        await self.app(scope, receive, send_comprimido)
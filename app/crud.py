@@ -1,10 +1,74 @@
 # app/crud.py
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func, update, insert, delete, literal, exists, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
 from app import models, schemas
-from passlib.context import CryptContext
-from datetime import datetime
+from app.busqueda import normalizar
+from app.cache import CacheVersionada
+from app.hashing import hash_pool, crear_contexto
+from datetime import datetime, timedelta
+import hashlib
+import os
+import secrets
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Política de hash configurada con BCRYPT_ROUNDS (ver app.hashing)
+pwd_context = crear_contexto()
+
+
+# -------------------------
+# SELLOS DE VERSIÓN
+# -------------------------
+
+# Devuelve (valor, fecha_modificacion) de un sello; (0, None) si aún no existe
+def get_version(db: Session, nombre: str):
+    version = db.get(models.Version, nombre)
+    if version is None:
+        return 0, None
+    return version.valor, version.fecha_modificacion
+
+# Incrementa el sello sin hacer commit (va en la transacción de la escritura).
+# Las filas de los sellos las crean las migraciones (app.migraciones.SELLOS).
+def bump_version(db: Session, nombre: str):
+    result = db.execute(
+        update(models.Version)
+        .where(models.Version.nombre == nombre)
+        .values(valor=models.Version.valor + 1, fecha_modificacion=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise RuntimeError(f"No existe el sello de versión '{nombre}': ejecuta python -m app.cli migrar")
+    # Para invalidar las cachés locales al hacer commit (ver app.catalogo)
+    db.info.setdefault("versiones_modificadas", set()).add(nombre)
+
+# Como bump_version, pero el sello se incrementa después del commit, en una
+# transacción propia y corta (ver app.catalogo). Es para sellos que cambian en
+# escrituras muy frecuentes: dentro de la transacción, la fila del sello
+# quedaría bloqueada hasta el commit y las serializaría todas.
+def bump_version_tras_commit(db: Session, nombre: str):
+    db.info.setdefault("versiones_tras_commit", set()).add(nombre)
+
+# Incrementa los sellos en una transacción aparte (siempre en el mismo orden)
+def publicar_versiones(bind, nombres):
+    with bind.begin() as conn:
+        for nombre in sorted(nombres):
+            conn.execute(
+                update(models.Version)
+                .where(models.Version.nombre == nombre)
+                .values(valor=models.Version.valor + 1, fecha_modificacion=datetime.utcnow())
+            )
+
+# Caché de usuarios autenticados (clave: email del "sub" del token), ligada
+# al sello "usuarios" que incrementan todas las escrituras de usuarios: un
+# usuario deshabilitado o con otro rol deja de servirse desde la caché de
+# cualquier worker en, como mucho, PRINCIPAL_POLL_INTERVAL segundos
+principal_cache = CacheVersionada(
+    lambda db: get_version(db, "usuarios"),
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    intervalo=float(os.getenv("PRINCIPAL_POLL_INTERVAL", "2")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
 
 # -------------------------
 # CURSOS
@@ -13,17 +77,28 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 def get_cursos(db: Session):
     return db.query(models.Curso).all()
 
-def create_curso(db: Session, curso: schemas.CursoBase):
-    duracion = curso.duracion
+# Consulta de cursos con filtros opcionales (para paginar en el router)
+def query_cursos(db: Session, activo: bool = None):
+    query = db.query(models.Curso)
+    if activo is not None:
+        query = query.filter(models.Curso.activo == activo)
+    return query
+
+# La duración se guarda siempre como "<n> semanas"
+def normalizar_duracion(duracion: str) -> str:
     if not duracion.endswith(" semanas"):
         duracion = f"{duracion} semanas"
+    return duracion
+
+def create_curso(db: Session, curso: schemas.CursoBase):
     nuevo = models.Curso(
         nombre=curso.nombre,
         descripcion=curso.descripcion,
-        duracion=duracion,
+        duracion=normalizar_duracion(curso.duracion),
         activo=curso.activo
     )
     db.add(nuevo)
+    bump_version(db, "catalogo")
     db.commit()
     db.refresh(nuevo)
     return nuevo
@@ -34,13 +109,12 @@ def update_curso(db: Session, curso_id: int, datos: dict):
         return None
 
     if "duracion" in datos:
-        duracion = datos["duracion"]
-        if not duracion.endswith(" semanas"):
-            datos["duracion"] = f"{duracion} semanas"
+        datos["duracion"] = normalizar_duracion(datos["duracion"])
 
     for key, value in datos.items():
         setattr(curso, key, value)
 
+    bump_version(db, "catalogo")
     db.commit()
     db.refresh(curso)
     return curso
@@ -50,6 +124,7 @@ def delete_curso(db: Session, curso_id: int):
     if not curso:
         return None
     db.delete(curso)
+    bump_version(db, "catalogo")
     db.commit()
     return curso
 
@@ -58,7 +133,49 @@ def delete_curso(db: Session, curso_id: int):
 # -------------------------
 
 def get_usuarios(db: Session):
-    return db.query(models.Usuario).all()
+    return db.query(models.Usuario).options(joinedload(models.Usuario.rol)).all()
+
+# Consulta de usuarios con filtros opcionales (para paginar en el router).
+# El rol se carga en la misma consulta porque UsuarioOut lo serializa.
+def query_usuarios(db: Session, id_rol: int = None, habilitado: bool = None, tipo: str = None):
+    query = db.query(models.Usuario).options(joinedload(models.Usuario.rol))
+    if id_rol is not None:
+        query = query.filter(models.Usuario.id_rol == id_rol)
+    if habilitado is not None:
+        query = query.filter(models.Usuario.habilitado == habilitado)
+    if tipo is not None:
+        query = query.filter(models.Usuario.tipo == tipo)
+    return query
+
+# Columnas normalizadas por las que se busca en el autocompletado, en orden de preferencia
+COLUMNAS_BUSQUEDA_USUARIOS = [
+    models.Usuario.busqueda_nombre,
+    models.Usuario.busqueda_apellidos,
+    models.Usuario.busqueda_email,
+]
+
+# Usuarios cuya clave empieza por el prefijo (ya normalizado). Se pide como
+# rango (clave >= prefijo AND clave < prefijo siguiente) para que recorra
+# el índice ordenado en cualquier motor, a diferencia de LIKE 'x%'.
+def query_prefijo_usuarios(db: Session, columna, prefijo: str, limite: int):
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return db.query(models.Usuario).options(joinedload(models.Usuario.rol)).filter(
+        columna >= prefijo, columna < siguiente
+    ).order_by(columna).limit(limite)
+
+# Autocompletado: primero coincidencias por nombre, luego por apellidos y
+# por último por email, sin repetir usuarios
+def buscar_usuarios_por_prefijo(db: Session, texto: str, limite: int):
+    prefijo = " ".join(normalizar(texto).split())
+    if not prefijo:
+        return []
+    encontrados = {}
+    for columna in COLUMNAS_BUSQUEDA_USUARIOS:
+        for usuario in query_prefijo_usuarios(db, columna, prefijo, limite):
+            encontrados.setdefault(usuario.id, usuario)
+        if len(encontrados) >= limite:
+            break
+    return list(encontrados.values())[:limite]
 
 def get_usuario(db: Session, usuario_id: int):
     return db.query(models.Usuario).filter(models.Usuario.id == usuario_id).first()
@@ -66,8 +183,16 @@ def get_usuario(db: Session, usuario_id: int):
 def get_usuario_by_email(db: Session, email: str):
     return db.query(models.Usuario).filter(models.Usuario.email == email).first()
 
-def create_usuario(db: Session, usuario: schemas.UsuarioCreate):
-    hashed_password = pwd_context.hash(usuario.password)
+# Emails de la lista que ya están registrados, en una sola consulta
+def get_emails_registrados(db: Session, emails) -> set:
+    if not emails:
+        return set()
+    filas = db.query(models.Usuario.email).filter(models.Usuario.email.in_(list(emails))).all()
+    return {email for (email,) in filas}
+
+def create_usuario(db: Session, usuario: schemas.UsuarioCreate, hashed_password: str = None):
+    if hashed_password is None:
+        hashed_password = get_password_hash(usuario.password)
     db_usuario = models.Usuario(
         nombre=usuario.nombre,
         apellidos=usuario.apellidos,
@@ -78,12 +203,36 @@ def create_usuario(db: Session, usuario: schemas.UsuarioCreate):
         id_rol=usuario.id_rol or 3
     )
     db.add(db_usuario)
-    db.commit()
+    # Sin SELECT previo: si el email ya existe salta la restricción UNIQUE
+    # y el router responde 400 (ver es_email_duplicado)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
     db.refresh(db_usuario)
     return db_usuario
 
+# True si el IntegrityError es la restricción UNIQUE del email de usuarios
+# (y no, p. ej., la FK de id_rol). Cada driver lo informa a su manera:
+# - PostgreSQL: SQLSTATE 23505 y el nombre de la restricción en diag
+# - MySQL: error 1062 "Duplicate entry '...' for key 'ix_usuarios_email'"
+# - SQLite: "UNIQUE constraint failed: usuarios.email"
+def es_email_duplicado(error: IntegrityError) -> bool:
+    orig = error.orig
+    codigo = getattr(orig, "pgcode", None)
+    if codigo is not None:
+        restriccion = getattr(getattr(orig, "diag", None), "constraint_name", None) or ""
+        return codigo == "23505" and "email" in restriccion
+    mensaje = str(orig)
+    args = getattr(orig, "args", ())
+    if args and args[0] == 1062:
+        # Solo el nombre de la clave: el valor duplicado podría contener "email"
+        return "email" in mensaje.rsplit(" for key ", 1)[-1]
+    return mensaje.startswith("UNIQUE constraint failed") and "usuarios.email" in mensaje
+
 def create_administrador(db: Session, admin: schemas.UsuarioAdminCreate):
-    hashed_password = pwd_context.hash(admin.password)
+    hashed_password = get_password_hash(admin.password)
     db_admin = models.Usuario(
         nombre=admin.nombre,
         apellidos=admin.apellidos,
@@ -103,29 +252,431 @@ def update_usuario(db: Session, usuario_id: int, datos: dict):
     if not db_usuario:
         return None
 
+    email_anterior = db_usuario.email
     for campo, valor in datos.items():
         if campo == "password" and valor:
             setattr(db_usuario, campo, get_password_hash(valor))
         elif valor is not None:
             setattr(db_usuario, campo, valor)
 
+    if datos.get("password"):
+        revocar_refresh_tokens_usuario(db, db_usuario.id)
+
     db_usuario.fecha_modificacion = datetime.utcnow()
+    bump_version(db, "usuarios")
     db.commit()
     db.refresh(db_usuario)
+    invalidar_principal(email_anterior, db_usuario.email)
     return db_usuario
 
+# -------------------------
+# INSCRIPCIONES
+# -------------------------
+
+# Ajusta los contadores del curso con un UPDATE atómico. No hace commit: se
+# llama dentro de la transacción que crea/borra/completa la inscripción.
+def ajustar_contadores_curso(db: Session, curso_id: int, inscritos: int = 0, completados: int = 0):
+    db.execute(
+        update(models.Curso)
+        .where(models.Curso.id == curso_id)
+        .values(
+            total_inscritos=models.Curso.total_inscritos + inscritos,
+            total_completados=models.Curso.total_completados + completados,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # Sello propio: cambiar el de "catalogo" en cada inscripción tiraría las
+    # cachés del catálogo en todos los workers (ver app.catalogo). Se publica
+    # tras el commit para que su fila no bloquee las inscripciones de otros cursos.
+    bump_version_tras_commit(db, "contadores")
+
+# Recalcula todos los contadores a partir de la tabla inscripciones
+def reconciliar_contadores(db: Session):
+    inscritos = select(func.count(models.Inscripcion.id)).where(
+        models.Inscripcion.id_curso == models.Curso.id
+    ).scalar_subquery()
+    completados = select(func.count(models.Inscripcion.id)).where(
+        models.Inscripcion.id_curso == models.Curso.id,
+        models.Inscripcion.completado == True
+    ).scalar_subquery()
+    result = db.execute(
+        update(models.Curso)
+        .values(total_inscritos=inscritos, total_completados=completados)
+        .execution_options(synchronize_session=False)
+    )
+    bump_version_tras_commit(db, "contadores")
+    db.commit()
+    return result.rowcount
+
+# Usuarios afectados por una operación en bloque: por ids, por rol o ambos
+def _filtro_usuarios_bloque(ids_usuario: list = None, id_rol: int = None):
+    condiciones = []
+    if ids_usuario is not None:
+        condiciones.append(models.Usuario.id.in_(ids_usuario))
+    if id_rol is not None:
+        condiciones.append(models.Usuario.id_rol == id_rol)
+    return condiciones
+
+# INSERT que omite las filas que chocan con una restricción única en vez de
+# fallar: ON CONFLICT DO NOTHING (PostgreSQL/SQLite) o INSERT IGNORE (MySQL)
+def _insert_sin_duplicados(db: Session, modelo):
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    elif dialecto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    else:
+        return insert(modelo).prefix_with("IGNORE", dialect="mysql")
+    return insert_dialecto(modelo).on_conflict_do_nothing()
+
+# Inscribe de una vez a los usuarios indicados con un INSERT ... SELECT que
+# omite a los que ya están inscritos. Si otra inscripción entra a la vez, el
+# índice único la rechaza sin error (ver _insert_sin_duplicados) y los
+# contadores suben solo por las filas insertadas de verdad (rowcount).
+# Devuelve {solicitados, inscritos, ya_inscritos}. No hace commit.
+def inscribir_en_bloque(db: Session, curso_id: int, ids_usuario: list = None, id_rol: int = None):
+    condiciones = _filtro_usuarios_bloque(ids_usuario, id_rol)
+    solicitados = db.execute(select(func.count(models.Usuario.id)).where(*condiciones)).scalar()
+
+    ya_inscrito = exists().where(
+        models.Inscripcion.id_usuario == models.Usuario.id,
+        models.Inscripcion.id_curso == curso_id
+    )
+    candidatos = select(
+        models.Usuario.id, literal(curso_id), literal(datetime.utcnow()), literal(False)
+    ).where(*condiciones, ~ya_inscrito)
+    result = db.execute(
+        _insert_sin_duplicados(db, models.Inscripcion).from_select(
+            ["id_usuario", "id_curso", "fecha_inscripcion", "completado"], candidatos
+        )
+    )
+    inscritos = result.rowcount
+    if inscritos:
+        ajustar_contadores_curso(db, curso_id, inscritos=inscritos)
+    return {"solicitados": solicitados, "inscritos": inscritos, "ya_inscritos": solicitados - inscritos}
+
+# Marca como completada la inscripción con un UPDATE condicional: de dos
+# peticiones a la vez solo una cambia la fila y suma al contador. Devuelve
+# las filas cambiadas (0 si ya estaba completada o no existe). No hace commit.
+def completar_inscripcion(db: Session, id_usuario: int, curso_id: int) -> int:
+    result = db.execute(
+        update(models.Inscripcion)
+        .where(
+            models.Inscripcion.id_usuario == id_usuario,
+            models.Inscripcion.id_curso == curso_id,
+            models.Inscripcion.completado == False
+        )
+        .values(completado=True)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        ajustar_contadores_curso(db, curso_id, completados=result.rowcount)
+    return result.rowcount
+
+# Borra las inscripciones del curso que cumplen las condiciones y ajusta los
+# contadores según las filas borradas de verdad (rowcount), no según una
+# lectura previa que otra petición puede dejar obsoleta. Se borran primero
+# las completadas y después el resto. Devuelve las filas borradas. No hace commit.
+def borrar_inscripciones(db: Session, curso_id: int, *condiciones) -> int:
+    borradas = {}
+    for completado in (True, False):
+        result = db.execute(
+            delete(models.Inscripcion)
+            .where(models.Inscripcion.id_curso == curso_id, models.Inscripcion.completado == completado, *condiciones)
+            .execution_options(synchronize_session=False)
+        )
+        borradas[completado] = result.rowcount
+    total = borradas[True] + borradas[False]
+    if total:
+        ajustar_contadores_curso(db, curso_id, inscritos=-total, completados=-borradas[True])
+    return total
+
+# Da de baja de una vez a los usuarios indicados (un DELETE para las
+# completadas y otro para el resto).
+# Devuelve {solicitados, dados_de_baja, no_inscritos}. No hace commit.
+def desinscribir_en_bloque(db: Session, curso_id: int, ids_usuario: list = None, id_rol: int = None):
+    condiciones = _filtro_usuarios_bloque(ids_usuario, id_rol)
+    solicitados = db.execute(select(func.count(models.Usuario.id)).where(*condiciones)).scalar()
+
+    usuarios = select(models.Usuario.id).where(*condiciones)
+    dados_de_baja = borrar_inscripciones(db, curso_id, models.Inscripcion.id_usuario.in_(usuarios))
+    return {"solicitados": solicitados, "dados_de_baja": dados_de_baja, "no_inscritos": solicitados - dados_de_baja}
+
+# Participantes de varios cursos en una sola consulta: {id_curso: [usuarios]}
+def get_participantes_por_curso(db: Session, curso_ids: list):
+    participantes = {curso_id: [] for curso_id in curso_ids}
+    filas = db.query(models.Inscripcion.id_curso, models.Usuario).join(
+        models.Usuario,
+        models.Usuario.id == models.Inscripcion.id_usuario
+    ).options(
+        joinedload(models.Usuario.rol)
+    ).filter(
+        models.Inscripcion.id_curso.in_(curso_ids)
+    ).order_by(models.Inscripcion.id_curso, models.Inscripcion.id).all()
+
+    for curso_id, usuario in filas:
+        participantes[curso_id].append(usuario)
+    return participantes
+
+# IDs de los cursos de un usuario, en orden de inscripción
+def get_ids_cursos_inscritos(db: Session, id_usuario: int):
+    filas = db.query(models.Inscripcion.id_curso).filter(
+        models.Inscripcion.id_usuario == id_usuario
+    ).order_by(models.Inscripcion.id).all()
+    return [id_curso for (id_curso,) in filas]
+
+def query_inscripciones(db: Session, id_usuario: int, completado: bool = None):
+    query = db.query(models.Inscripcion).filter(models.Inscripcion.id_usuario == id_usuario)
+    if completado is not None:
+        query = query.filter(models.Inscripcion.completado == completado)
+    return query
+
+# -------------------------
+# USUARIO AUTENTICADO (CACHÉ)
+# -------------------------
+
+# Devuelve el usuario del token sin consultar la BD si ya está en caché.
+# Se guarda una copia desacoplada de la sesión (UsuarioOut) para poder
+# reutilizarla entre peticiones.
+def get_principal(db: Session, email: str):
+    version, _ = principal_cache.version_actual(db)
+    user = principal_cache.get(version, email)
+    if user is not None:
+        return user
+    return cargar_principal(db, email)
+
+# Consulta el usuario (con su rol) y lo guarda en la caché. El sello se lee
+# antes que la fila: si cambia entre medias, la entrada queda con la versión
+# antigua y se descarta en la siguiente comprobación.
+def cargar_principal(db: Session, email: str):
+    version, _ = principal_cache.version_actual(db)
+    db_usuario = db.query(models.Usuario).options(
+        joinedload(models.Usuario.rol)
+    ).filter(models.Usuario.email == email).first()
+    if db_usuario is None:
+        return None
+
+    user = schemas.UsuarioOut.model_validate(db_usuario)
+    principal_cache.set(version, email, user)
+    return user
+
+# Eliminar de la caché de este worker a los usuarios modificados (rol,
+# habilitado, email...); los demás workers lo ven por el sello "usuarios"
+def invalidar_principal(*emails):
+    for email in emails:
+        if email:
+            principal_cache.delete(email)
+
 # -------------------------
 # AUTENTICACIÓN
 # -------------------------
 
+# bcrypt se ejecuta en el pool dedicado de app.hashing (lanza
+# HashPoolSaturado si está lleno)
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hash_pool.run(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_pool.run(pwd_context.hash, password)
+
+# Hash de muchas contraseñas en paralelo (importaciones); espera turno en
+# el pool en vez de rechazar
+def hash_passwords(passwords: list) -> list:
+    return hash_pool.map(pwd_context.hash, passwords)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await hash_pool.run_async(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await hash_pool.run_async(pwd_context.hash, password)
 
+# Guarda el hash rehecho con la política actual. Solo si la contraseña no ha
+# cambiado mientras tanto, y sin tocar fecha_modificacion: no es un cambio
+# visible del usuario.
+def guardar_rehash(db: Session, user: models.Usuario, hash_anterior: str, nuevo_hash: str):
+    db.execute(
+        update(models.Usuario)
+        .where(models.Usuario.id == user.id, models.Usuario.password == hash_anterior)
+        # fecha_modificacion tiene onupdate: se reasigna a sí misma para conservarla
+        .values(password=nuevo_hash, fecha_modificacion=models.Usuario.fecha_modificacion)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    # El commit caduca `user`: se recarga aquí (en el threadpool, en la variante
+    # async) para que leer sus campos después no lance un SELECT en el event loop
+    db.refresh(user)
+
+# verify_and_update comprueba la contraseña y, si el hash usa otro coste,
+# devuelve uno nuevo calculado en la misma llamada (la contraseña en claro
+# solo está disponible aquí)
 def authenticate_user(db: Session, email: str, password: str):
     user = get_usuario_by_email(db, email)
-    if not user or not verify_password(password, user.password):
+    if not user:
         return None
+    valida, nuevo_hash = hash_pool.run(pwd_context.verify_and_update, password, user.password)
+    if not valida:
+        return None
+    if nuevo_hash:
+        guardar_rehash(db, user, user.password, nuevo_hash)
+    return user
+
+# Variante para rutas async: la consulta va al threadpool y bcrypt al pool
+# de hashing, sin ocupar un hilo mientras se espera el hash
+async def authenticate_user_async(db: Session, email: str, password: str):
+    user = await run_in_threadpool(get_usuario_by_email, db, email)
+    if not user:
+        return None
+    valida, nuevo_hash = await hash_pool.run_async(pwd_context.verify_and_update, password, user.password)
+    if not valida:
+        return None
+    if nuevo_hash:
+        await run_in_threadpool(guardar_rehash, db, user, user.password, nuevo_hash)
+    return user
+
+# -------------------------
+# REFRESH TOKENS
+# -------------------------
+# Los tokens son aleatorios de 256 bits, así que basta con SHA-256 (no hace
+# falta bcrypt): renovar la sesión no cuesta CPU de hashing de contraseñas.
+
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# Crea un refresh token (nueva familia si no se indica) y devuelve el token
+# en claro, que solo conoce el cliente. No hace commit.
+def crear_refresh_token(db: Session, id_usuario: int, dias: int, familia: str = None) -> str:
+    token = secrets.token_urlsafe(32)
+    db.add(models.RefreshToken(
+        id_usuario=id_usuario,
+        token_hash=_hash_refresh_token(token),
+        familia=familia or secrets.token_hex(16),
+        fecha_expiracion=datetime.utcnow() + timedelta(days=dias),
+    ))
+    return token
+
+def revocar_familia(db: Session, familia: str):
+    db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.familia == familia, models.RefreshToken.fecha_revocacion.is_(None))
+        .values(fecha_revocacion=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+# Revoca todos los refresh tokens vigentes del usuario, p. ej. al cambiar la
+# contraseña: las sesiones abiertas con la anterior no pueden renovarse.
+# No hace commit.
+def revocar_refresh_tokens_usuario(db: Session, id_usuario: int):
+    db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.id_usuario == id_usuario, models.RefreshToken.fecha_revocacion.is_(None))
+        .values(fecha_revocacion=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+# Borra los tokens que ya no sirven: los caducados y los de familias sin
+# ningún token vigente (cerradas por logout, reutilización o cambio de
+# contraseña). Los revocados de una familia viva se conservan porque son los
+# que delatan que se ha reutilizado un token robado. La tabla derivada evita
+# el error 1093 de MySQL. Hace commit; devuelve las filas borradas.
+def purgar_refresh_tokens(db: Session) -> int:
+    ahora = datetime.utcnow()
+    vivas = select(models.RefreshToken.familia).where(
+        models.RefreshToken.fecha_revocacion.is_(None),
+        models.RefreshToken.fecha_expiracion > ahora
+    ).subquery()
+    result = db.execute(
+        delete(models.RefreshToken)
+        .where(or_(
+            models.RefreshToken.fecha_expiracion <= ahora,
+            models.RefreshToken.familia.not_in(select(vivas.c.familia)),
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+# Revoca el token presentado y emite otro de la misma familia. Devuelve
+# (usuario, nuevo token) o None si el token no existe, ha caducado, ya se
+# había usado (token robado: revoca toda la familia) o el usuario está
+# deshabilitado.
+# Hace commit.
+def rotar_refresh_token(db: Session, token: str, dias: int):
+    ahora = datetime.utcnow()
+    actual = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == _hash_refresh_token(token)
+    ).first()
+    if actual is None:
+        return None
+    if actual.fecha_expiracion <= ahora:
+        return None
+
+    # UPDATE condicional: de dos peticiones con el mismo token solo gana una
+    result = db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.id == actual.id, models.RefreshToken.fecha_revocacion.is_(None))
+        .values(fecha_revocacion=ahora)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        revocar_familia(db, actual.familia)
+        db.commit()
+        return None
+
+    # Un usuario deshabilitado (o borrado) no renueva la sesión: se cierra la familia
+    usuario = db.get(models.Usuario, actual.id_usuario)
+    if usuario is None or not usuario.habilitado:
+        revocar_familia(db, actual.familia)
+        db.commit()
+        return None
+    nuevo = crear_refresh_token(db, usuario.id, dias, familia=actual.familia)
+    db.commit()
+    return usuario, nuevo
+
+# Cierre de sesión: revoca la familia del token. Devuelve False si no existe.
+def revocar_refresh_token(db: Session, token: str) -> bool:
+    actual = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == _hash_refresh_token(token)
+    ).first()
+    if actual is None:
+        return False
+    revocar_familia(db, actual.familia)
+    db.commit()
+    return True
+
+# -------------------------
+# VARIANTES ASÍNCRONAS (AsyncSession)
+# -------------------------
+# Solo lo que usa la autenticación de las rutas async con DB_ASYNC=true
+# (deps.resolve_principal); el resto de rutas usa la sesión síncrona.
+
+async def get_version_async(db: AsyncSession, nombre: str):
+    version = await db.get(models.Version, nombre)
+    if version is None:
+        return 0, None
+    return version.valor, version.fecha_modificacion
+
+async def get_principal_async(db: AsyncSession, email: str):
+    version = await version_principales_async(db)
+    user = principal_cache.get(version, email)
+    if user is not None:
+        return user
+    return await cargar_principal_async(db, email)
+
+async def version_principales_async(db: AsyncSession):
+    version = principal_cache.version_vigente()
+    if version is None:
+        version, _ = principal_cache.registrar_version(*await get_version_async(db, "usuarios"))
+    return version
+
+async def cargar_principal_async(db: AsyncSession, email: str):
+    version = await version_principales_async(db)
+    result = await db.execute(
+        select(models.Usuario).options(joinedload(models.Usuario.rol)).filter(models.Usuario.email == email)
+    )
+    db_usuario = result.scalars().first()
+    if db_usuario is None:
+        return None
+
+    user = schemas.UsuarioOut.model_validate(db_usuario)
+    principal_cache.set(version, email, user)
     return user
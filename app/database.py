@@ -1,8 +1,13 @@
 # app/database.py
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
+from threading import Lock
+from app.metricas import Histograma, instrumentar_consultas
 import os
+import time
 
 # -------------------------
 # CARGAR VARIABLES DE ENTORNO
@@ -12,13 +17,113 @@ load_dotenv()
 # URL de conexión a la base de datos (desde .env)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# -------------------------
+# POOL DE CONEXIONES (configurable desde .env)
+# -------------------------
+DB_ECHO = os.getenv("DB_ECHO", "true").lower() in ("1", "true", "yes")
+
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes"),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+}
+
+# QueuePool que mide cuánto tarda cada checkout y cuántos hilos esperan
+# conexión (solo cuenta los checkouts que no encuentran ninguna libre ni
+# pueden abrir otra por el límite de overflow; el resto no espera)
+class QueuePoolConMetricas(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_metricas = Lock()
+        self.esperando = 0
+        self.esperas = 0
+        self.checkouts = 0
+        self.errores = 0
+        self.checkout_ms = Histograma([1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000])
+
+    def _sin_conexion_libre(self) -> bool:
+        return self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+
+    def _do_get(self):
+        espera = self._sin_conexion_libre()
+        if espera:
+            with self._lock_metricas:
+                self.esperando += 1
+                self.esperas += 1
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except Exception:
+            with self._lock_metricas:
+                self.errores += 1
+            raise
+        finally:
+            if espera:
+                with self._lock_metricas:
+                    self.esperando -= 1
+            self.checkout_ms.observe((time.perf_counter() - inicio) * 1000)
+        with self._lock_metricas:
+            self.checkouts += 1
+        return conexion
+
+    def estadisticas(self) -> dict:
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(0, self.overflow()),
+            "esperando": self.esperando,
+            "esperas": self.esperas,
+            "checkouts": self.checkouts,
+            "errores": self.errores,
+            "checkout_ms": self.checkout_ms.snapshot(),
+        }
+
 # -------------------------
 # CONEXIÓN A MYSQL
 # -------------------------
-engine = create_engine(DATABASE_URL, echo=True)
+engine = create_engine(DATABASE_URL, echo=DB_ECHO, poolclass=QueuePoolConMetricas, **POOL_OPTIONS)
+instrumentar_consultas(engine)
+
+# Máximo de sentencias SQL por petición antes de avisar (0 = sin control)
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "0"))
 
 # Sesión de base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# -------------------------
+# MODO ASÍNCRONO (OPCIONAL)
+# -------------------------
+# Con DB_ASYNC=true se crea además un engine async para las rutas async
+# (guards de páginas, autenticación). El engine síncrono sigue disponible.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Driver async equivalente a cada driver síncrono
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername)).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(DATABASE_URL)
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=DB_ECHO, **POOL_OPTIONS)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    instrumentar_consultas(async_engine.sync_engine)
+
 # Base para los modelos ORM
 Base = declarative_base()
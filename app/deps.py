@@ -1,11 +1,14 @@
 # app/deps.py
 from fastapi import Depends, HTTPException, status, Request, Form
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
 from jose import jwt, JWTError
-from app.database import SessionLocal
+from app.database import SessionLocal, AsyncSessionLocal
 from app import crud, schemas
+from app.cache import TTLCache
+import hashlib
 import os
+import time
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -19,14 +22,64 @@ ALGORITHM = os.getenv("ALGORITHM")
 # OAuth2 token bearer (con auto_error=False para permitir otras fuentes)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
-# Dependencia para obtener la sesión de la base de datos
-def get_db():
+# Caché de claims ya verificados (clave: sha256 del token, caduca con "exp")
+token_cache = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "4096")))
+
+# Decodificar y verificar un JWT, reutilizando el resultado si el mismo
+# token ya se verificó antes. Lanza JWTError si el token no es válido.
+def decode_token(token: str) -> dict:
+    clave = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(clave)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    exp = payload.get("exp")
+    if exp is not None:
+        restante = exp - time.time()
+        if restante > 0:
+            token_cache.set(clave, payload, ttl=restante)
+    return payload
+
+# Dependencia para obtener la sesión de la base de datos.
+# Hay una sola sesión por petición (request.state.db) que comparten la
+# autenticación y la ruta. La Session no pide conexión al pool hasta la
+# primera consulta, así que si nadie la usa no cuesta ningún checkout.
+def get_db(request: Request):
     db = SessionLocal()
+    request.state.db = db
     try:
         yield db
+    finally:
+        request.state.db = None
+        db.close()
+
+def _cargar_principal_sync(email: str):
+    db = SessionLocal()
+    try:
+        return crud.get_principal(db, email)
     finally:
         db.close()
 
+# Obtener el usuario del token sin bloquear el event loop: primero la caché,
+# después la sesión de la petición si la ruta usa get_db, el engine async si
+# está activo o, si no, una sesión síncrona propia en el threadpool
+async def resolve_principal(email: str, request: Optional[Request] = None):
+    # Sin BD mientras la versión del sello "usuarios" esté vigente; si toca
+    # comprobarla se hace abajo, con la misma sesión que cargaría el usuario
+    version = crud.principal_cache.version_vigente()
+    user = crud.principal_cache.get(version, email) if version is not None else None
+    if user is not None:
+        return user
+
+    db = getattr(request.state, "db", None) if request is not None else None
+    if db is not None:
+        return await run_in_threadpool(crud.get_principal, db, email)
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await crud.get_principal_async(db, email)
+    return await run_in_threadpool(_cargar_principal_sync, email)
+
 # Función para extraer el token de diferentes fuentes
 async def extract_token_from_request(request: Request) -> Optional[str]:
     # Intentar obtener de cookies
@@ -54,8 +107,8 @@ async def extract_token_from_request(request: Request) -> Optional[str]:
 
 # Función para obtener el usuario actual para rutas de API (usando Depends)
 async def get_current_user_api(
-    token: Optional[str] = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    request: Request,
+    token: Optional[str] = Depends(oauth2_scheme)
 ) -> schemas.UsuarioOut:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -68,14 +121,14 @@ async def get_current_user_api(
     
     try:
         # Decodificar y verificar el token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = crud.get_usuario_by_email(db, email)
+    user = await resolve_principal(email, request)
     if user is None:
         raise credentials_exception
     
@@ -89,38 +142,33 @@ async def get_current_user(request: Request) -> schemas.UsuarioOut:
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # Obtener la sesión de la base de datos
-    db = SessionLocal()
+    # Extraer el token de la solicitud
+    token = await extract_token_from_request(request)
+    
+    # Si no se encontró token en ninguna fuente, lanzar excepción
+    if not token:
+        print("No se encontró token en ninguna fuente")
+        raise credentials_exception
+    
     try:
-        # Extraer el token de la solicitud
-        token = await extract_token_from_request(request)
-        
-        # Si no se encontró token en ninguna fuente, lanzar excepción
-        if not token:
-            print("No se encontró token en ninguna fuente")
-            raise credentials_exception
-        
-        try:
-            # Decodificar y verificar el token
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            email: str = payload.get("sub")
-            if email is None:
-                print("No se encontró 'sub' en el payload del token")
-                raise credentials_exception
-        except JWTError as e:
-            print(f"Error al decodificar token: {str(e)}")
-            raise credentials_exception
-        
-        # Obtener el usuario de la base de datos
-        user = crud.get_usuario_by_email(db, email)
-        if user is None:
-            print(f"No se encontró usuario con email: {email}")
+        # Decodificar y verificar el token
+        payload = decode_token(token)
+        email: str = payload.get("sub")
+        if email is None:
+            print("No se encontró 'sub' en el payload del token")
             raise credentials_exception
-        
-        print(f"Usuario autenticado correctamente: {user.email}")
-        return user
-    finally:
-        db.close()
+    except JWTError as e:
+        print(f"Error al decodificar token: {str(e)}")
+        raise credentials_exception
+    
+    # Obtener el usuario (caché o base de datos, sin bloquear el event loop)
+    user = await resolve_principal(email, request)
+    if user is None:
+        print(f"No se encontró usuario con email: {email}")
+        raise credentials_exception
+    
+    print(f"Usuario autenticado correctamente: {user.email}")
+    return user
 
 # Función auxiliar para verificar roles
 def check_user_role(user: schemas.UsuarioOut, allowed_roles: list):
@@ -0,0 +1,155 @@
+# app/hashing.py
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+import asyncio
+import os
+import statistics
+import time
+
+# -------------------------
+# CARGAR VARIABLES DE ENTORNO
+# -------------------------
+load_dotenv()
+
+# Hilos dedicados a bcrypt (bcrypt libera el GIL mientras calcula el hash)
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 2)))
+# Peticiones que pueden esperar turno antes de rechazar las nuevas
+HASH_POOL_MAX_QUEUE = int(os.getenv("HASH_POOL_MAX_QUEUE", "32"))
+
+
+# Coste de bcrypt (log2 de las iteraciones). Calibrar en la máquina de
+# despliegue con: python -m app.cli calibrar-bcrypt --objetivo-ms 250
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+
+# -------------------------
+# POLÍTICA DE HASH
+# -------------------------
+# Los hashes con un coste distinto (mayor o menor) al configurado se marcan
+# como obsoletos, y authenticate_user los rehace al iniciar sesión. Así,
+# cambiar BCRYPT_ROUNDS ajusta el coste de todas las cuentas poco a poco.
+def crear_contexto(rondas: int = BCRYPT_ROUNDS) -> CryptContext:
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rondas,
+        bcrypt__min_rounds=rondas,
+        bcrypt__max_rounds=rondas,
+    )
+
+# Mide cuánto tarda un hash con cada coste (mediana de `muestras`) desde
+# `minimo` hasta pasarse del objetivo. Devuelve ([(rondas, ms)], rondas
+# recomendadas = el mayor coste que no supera el objetivo).
+def calibrar(objetivo_ms: float, minimo: int = 8, maximo: int = 16, muestras: int = 3):
+    mediciones = []
+    recomendadas = minimo
+    for rondas in range(minimo, maximo + 1):
+        contexto = crear_contexto(rondas)
+        tiempos = []
+        for _ in range(muestras):
+            inicio = time.perf_counter()
+            contexto.hash("calibracion-bcrypt")
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        ms = statistics.median(tiempos)
+        mediciones.append((rondas, ms))
+        if ms > objetivo_ms:
+            break
+        recomendadas = rondas
+    return mediciones, recomendadas
+
+
+# Se lanza cuando el pool está saturado; main.py lo convierte en un 503
+class HashPoolSaturado(Exception):
+    pass
+
+
+# -------------------------
+# POOL DE HASHING
+# -------------------------
+# Ejecuta las operaciones de bcrypt en un pool acotado. Como mucho hay
+# workers + max_cola operaciones admitidas a la vez; el resto se rechaza
+# al instante para que el login no acapare el threadpool de la app.
+class HashPool:
+    def __init__(self, workers: int, max_cola: int):
+        self.workers = workers
+        self.max_cola = max_cola
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._plazas = BoundedSemaphore(workers + max_cola)
+        self._lock = Lock()
+        self.pendientes = 0
+        self.en_ejecucion = 0
+        self.completadas = 0
+        self.rechazadas = 0
+
+    def _ejecutar(self, fn, args):
+        with self._lock:
+            self.en_ejecucion += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.en_ejecucion -= 1
+
+    def _liberar(self, _future):
+        with self._lock:
+            self.pendientes -= 1
+            self.completadas += 1
+        self._plazas.release()
+
+    # Con esperar=True espera plaza en vez de rechazar (solo desde hilos, nunca en el event loop)
+    def submit(self, fn, *args, esperar: bool = False):
+        if not self._plazas.acquire(blocking=esperar):
+            with self._lock:
+                self.rechazadas += 1
+            raise HashPoolSaturado("Demasiadas operaciones de autenticación en curso")
+
+        with self._lock:
+            self.pendientes += 1
+        try:
+            future = self._executor.submit(self._ejecutar, fn, args)
+        except Exception:
+            with self._lock:
+                self.pendientes -= 1
+            self._plazas.release()
+            raise
+        future.add_done_callback(self._liberar)
+        return future
+
+    # Para rutas síncronas: espera el resultado en el hilo actual
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    # Para rutas async: espera sin bloquear el event loop
+    async def run_async(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    # Para cargas masivas (importaciones): aplica fn a cada elemento en
+    # paralelo y devuelve los resultados en orden. Mantiene como mucho
+    # `workers` operaciones en vuelo, así que deja sitio en la cola a los
+    # logins en lugar de ocuparla entera.
+    def map(self, fn, elementos):
+        en_vuelo = deque()
+        resultados = []
+        for elemento in elementos:
+            if len(en_vuelo) >= self.workers:
+                resultados.append(en_vuelo.popleft().result())
+            en_vuelo.append(self.submit(fn, elemento, esperar=True))
+        resultados.extend(future.result() for future in en_vuelo)
+        return resultados
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_cola": self.max_cola,
+                "en_ejecucion": self.en_ejecucion,
+                "en_cola": max(0, self.pendientes - self.en_ejecucion),
+                "completadas": self.completadas,
+                "rechazadas": self.rechazadas,
+            }
+
+
+hash_pool = HashPool(HASH_POOL_WORKERS, HASH_POOL_MAX_QUEUE)
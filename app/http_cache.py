@@ -0,0 +1,36 @@
+# app/http_cache.py
+from fastapi import Request, Response
+from datetime import datetime
+import hashlib
+
+# -------------------------
+# GET CONDICIONALES (ETag / Last-Modified)
+# -------------------------
+
+# ETag fuerte a partir de las partes que identifican la versión del recurso
+def calcular_etag(*partes) -> str:
+    datos = "|".join(str(parte) for parte in partes).encode()
+    return '"' + hashlib.sha256(datos).hexdigest()[:32] + '"'
+
+# Las fechas del modelo se guardan en UTC sin zona horaria (datetime.utcnow)
+def formato_http(fecha: datetime) -> str:
+    return fecha.strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+# True si el cliente ya tiene esta versión (If-None-Match coincide)
+def no_modificado(request: Request, etag: str) -> bool:
+    cabecera = request.headers.get("if-none-match")
+    if not cabecera:
+        return False
+    # Comparación débil (RFC 9110): W/"x" equivale a "x"
+    etiquetas = [etiqueta.strip().removeprefix("W/") for etiqueta in cabecera.split(",")]
+    return "*" in etiquetas or etag in etiquetas
+
+def cabeceras_cache(etag: str, ultima_modificacion: datetime = None) -> dict:
+    # no-cache: el navegador guarda la respuesta pero revalida siempre con el ETag
+    cabeceras = {"ETag": etag, "Cache-Control": "no-cache"}
+    if ultima_modificacion is not None:
+        cabeceras["Last-Modified"] = formato_http(ultima_modificacion)
+    return cabeceras
+
+def respuesta_no_modificada(etag: str, ultima_modificacion: datetime = None) -> Response:
+    return Response(status_code=304, headers=cabeceras_cache(etag, ultima_modificacion))
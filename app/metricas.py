@@ -0,0 +1,108 @@
+# app/metricas.py
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from sqlalchemy import event
+
+
+# -------------------------
+# HISTOGRAMA ACUMULATIVO
+# -------------------------
+# Cuenta observaciones por tramos (límites superiores, en la unidad que
+# use quien lo alimente). Seguro entre hilos.
+class Histograma:
+    def __init__(self, limites):
+        self.limites = sorted(limites)
+        self._cuentas = [0] * (len(self.limites) + 1)
+        self._lock = Lock()
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def observe(self, valor: float):
+        i = bisect_left(self.limites, valor)
+        with self._lock:
+            self._cuentas[i] += 1
+            self.total += 1
+            self.suma += valor
+            if valor > self.maximo:
+                self.maximo = valor
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            tramos = {}
+            acumulado = 0
+            for limite, cuenta in zip(self.limites, self._cuentas):
+                acumulado += cuenta
+                tramos[f"<={limite:g}"] = acumulado
+            tramos["+Inf"] = acumulado + self._cuentas[-1]
+            return {
+                "tramos": tramos,
+                "total": self.total,
+                "media": (self.suma / self.total) if self.total else 0.0,
+                "maximo": self.maximo,
+            }
+
+
+# -------------------------
+# CONTADOR DE CONSULTAS SQL
+# -------------------------
+class ContadorConsultas:
+    def __init__(self):
+        self.total = 0
+        self.sentencias = []
+
+    def registrar(self, sentencia: str):
+        self.total += 1
+        self.sentencias.append(sentencia)
+
+
+# Contador de la petición en curso (lo activa el middleware de main.py)
+_contador_peticion = ContextVar("contador_peticion", default=None)
+
+# Engancha el contador al engine: cada sentencia se suma al contador de la
+# petición actual, si lo hay
+def instrumentar_consultas(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        contador = _contador_peticion.get()
+        if contador is not None:
+            contador.registrar(statement)
+
+@contextmanager
+def contar_consultas_peticion():
+    contador = ContadorConsultas()
+    token = _contador_peticion.set(contador)
+    try:
+        yield contador
+    finally:
+        _contador_peticion.reset(token)
+
+# Cuenta todas las sentencias que pasan por el engine mientras está activo,
+# vengan del hilo que vengan (p. ej. las de un TestClient)
+@contextmanager
+def contar_consultas(engine):
+    contador = ContadorConsultas()
+    lock = Lock()
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        with lock:
+            contador.registrar(statement)
+
+    event.listen(engine, "before_cursor_execute", _contar)
+    try:
+        yield contador
+    finally:
+        event.remove(engine, "before_cursor_execute", _contar)
+
+# Helper para tests: falla si el bloque ejecuta más de `maximo` sentencias.
+#   with max_consultas(engine, 2):
+#       client.get("/usuarios/mis-cursos", headers=...)
+@contextmanager
+def max_consultas(engine, maximo: int):
+    with contar_consultas(engine) as contador:
+        yield contador
+    if contador.total > maximo:
+        detalle = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(contador.sentencias, 1))
+        raise AssertionError(f"Se ejecutaron {contador.total} consultas (máximo {maximo}):\n{detalle}")
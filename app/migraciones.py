@@ -0,0 +1,219 @@
+# app/migraciones.py
+from sqlalchemy import Table, Column, Integer, String, DateTime, ForeignKey, Index, MetaData, inspect, select, insert, text
+from datetime import datetime
+
+from app import models
+from app.busqueda import normalizar
+from app.database import Base, engine
+
+# -------------------------
+# MIGRACIONES DE ESQUEMA VERSIONADAS
+# -------------------------
+# La BD en producción ya existe, así que no se puede usar create_all para
+# añadir columnas o índices. Cada cambio de esquema es una función numerada
+# que se aplica una sola vez; las aplicadas quedan en schema_migraciones.
+# Las migraciones usan SQL propio (no los modelos) para que no cambien si
+# los modelos evolucionan. Uso: python -m app.cli migrar
+
+_metadata = MetaData()
+
+schema_migraciones = Table(
+    "schema_migraciones", _metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("nombre", String(100), nullable=False),
+    Column("fecha_aplicacion", DateTime, nullable=False),
+)
+
+MIGRACIONES = []
+
+def migracion(version: int, nombre: str):
+    def registrar(funcion):
+        MIGRACIONES.append((version, nombre, funcion))
+        return funcion
+    return registrar
+
+
+# -------------------------
+# AYUDAS PARA DDL
+# -------------------------
+
+def _columnas(conn, tabla: str) -> set:
+    return {columna["name"] for columna in inspect(conn).get_columns(tabla)}
+
+def _indices(conn, tabla: str) -> list:
+    return inspect(conn).get_indexes(tabla)
+
+# Crea el índice salvo que ya exista con ese nombre o, si no es único, que
+# otro índice empiece por las mismas columnas (MySQL crea uno por cada FK)
+def _crear_indice(conn, nombre: str, tabla: str, columnas: list, unico: bool = False):
+    for indice in _indices(conn, tabla):
+        if indice["name"] == nombre:
+            return
+        if not unico and indice["column_names"][:len(columnas)] == columnas:
+            return
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unico else ''}INDEX {nombre} ON {tabla} ({', '.join(columnas)})"
+    ))
+
+def _anadir_columna_entera(conn, tabla: str, columna: str):
+    if columna not in _columnas(conn, tabla):
+        conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} INTEGER NOT NULL DEFAULT 0"))
+
+# Sellos de versión que usa la aplicación (ver crud.bump_version). Se crean
+# de antemano: si los creara la primera escritura, dos escrituras a la vez
+# chocarían en la clave primaria.
+SELLOS = ("catalogo", "contadores", "usuarios")
+
+def _sembrar_versiones(conn):
+    existentes = set(conn.execute(text("SELECT nombre FROM versiones")).scalars())
+    faltan = [nombre for nombre in SELLOS if nombre not in existentes]
+    if faltan:
+        conn.execute(
+            text("INSERT INTO versiones (nombre, valor, fecha_modificacion) VALUES (:nombre, 0, :fecha)"),
+            [{"nombre": nombre, "fecha": datetime.utcnow()} for nombre in faltan]
+        )
+
+def _recalcular_contadores(conn):
+    conn.execute(text(
+        "UPDATE cursos SET "
+        "total_inscritos = (SELECT COUNT(*) FROM inscripciones i WHERE i.id_curso = cursos.id), "
+        "total_completados = (SELECT COUNT(*) FROM inscripciones i WHERE i.id_curso = cursos.id AND i.completado = :si)"
+    ), {"si": True})
+
+
+# -------------------------
+# MIGRACIONES
+# -------------------------
+
+@migracion(1, "tabla_versiones")
+def _tabla_versiones(conn):
+    Table(
+        "versiones", MetaData(),
+        Column("nombre", String(50), primary_key=True),
+        Column("valor", Integer, nullable=False, default=0),
+        Column("fecha_modificacion", DateTime),
+    ).create(conn, checkfirst=True)
+    _sembrar_versiones(conn)
+
+@migracion(2, "contadores_de_cursos")
+def _contadores_de_cursos(conn):
+    _anadir_columna_entera(conn, "cursos", "total_inscritos")
+    _anadir_columna_entera(conn, "cursos", "total_completados")
+    _recalcular_contadores(conn)
+
+@migracion(3, "inscripciones_unicas")
+def _inscripciones_unicas(conn):
+    # Antes del índice único hay que quitar las inscripciones repetidas: se
+    # conserva la más antigua, marcada como completada si lo estaba alguna.
+    # Las tablas derivadas evitan el error 1093 de MySQL.
+    conn.execute(text(
+        "UPDATE inscripciones SET completado = :si WHERE completado = :no AND (id_usuario, id_curso) IN ("
+        "SELECT id_usuario, id_curso FROM (SELECT id_usuario, id_curso FROM inscripciones WHERE completado = :si) AS completadas)"
+    ), {"si": True, "no": False})
+    conn.execute(text(
+        "DELETE FROM inscripciones WHERE id NOT IN ("
+        "SELECT id FROM (SELECT MIN(id) AS id FROM inscripciones GROUP BY id_usuario, id_curso) AS primeras)"
+    ))
+    _crear_indice(conn, "uq_inscripciones_usuario_curso", "inscripciones", ["id_usuario", "id_curso"], unico=True)
+    # Los contadores pueden haber contado las repetidas
+    _recalcular_contadores(conn)
+
+@migracion(4, "indices_consultas_frecuentes")
+def _indices_consultas_frecuentes(conn):
+    _crear_indice(conn, "ix_inscripciones_id_curso", "inscripciones", ["id_curso"])
+    _crear_indice(conn, "ix_usuarios_id_rol", "usuarios", ["id_rol"])
+
+@migracion(5, "claves_busqueda_usuarios")
+def _claves_busqueda_usuarios(conn):
+    for columna in ("busqueda_nombre", "busqueda_apellidos", "busqueda_email"):
+        if columna not in _columnas(conn, "usuarios"):
+            conn.execute(text(f"ALTER TABLE usuarios ADD COLUMN {columna} VARCHAR(255) NULL"))
+
+    # Rellenar por tandas (la normalización se hace en Python)
+    ultimo_id = 0
+    while True:
+        filas = conn.execute(text(
+            "SELECT id, nombre, apellidos, email FROM usuarios WHERE id > :ultimo ORDER BY id LIMIT 1000"
+        ), {"ultimo": ultimo_id}).all()
+        if not filas:
+            break
+        conn.execute(text(
+            "UPDATE usuarios SET busqueda_nombre = :n, busqueda_apellidos = :a, busqueda_email = :e WHERE id = :id"
+        ), [
+            {"id": fila.id, "n": normalizar(f"{fila.nombre} {fila.apellidos}"),
+             "a": normalizar(f"{fila.apellidos} {fila.nombre}"), "e": normalizar(fila.email)}
+            for fila in filas
+        ])
+        ultimo_id = filas[-1].id
+
+    for columna in ("busqueda_nombre", "busqueda_apellidos", "busqueda_email"):
+        _crear_indice(conn, f"ix_usuarios_{columna}", "usuarios", [columna])
+
+@migracion(6, "refresh_tokens")
+def _refresh_tokens(conn):
+    metadata = MetaData()
+    Table("usuarios", metadata, Column("id", Integer, primary_key=True))
+    Table(
+        "refresh_tokens", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("id_usuario", Integer, ForeignKey("usuarios.id"), nullable=False),
+        Column("token_hash", String(64), nullable=False, unique=True),
+        Column("familia", String(32), nullable=False),
+        Column("fecha_creacion", DateTime),
+        Column("fecha_expiracion", DateTime, nullable=False),
+        Column("fecha_revocacion", DateTime, nullable=True),
+        Index("ix_refresh_tokens_familia", "familia"),
+    ).create(conn, checkfirst=True)
+
+@migracion(7, "version_fila_usuarios")
+def _version_fila_usuarios(conn):
+    _anadir_columna_entera(conn, "usuarios", "version_fila")
+
+# Para las BD que aplicaron la migración 1 antes de que sembrara los sellos
+@migracion(8, "sembrar_versiones")
+def _sembrar_versiones_existentes(conn):
+    _sembrar_versiones(conn)
+
+
+# -------------------------
+# EJECUCIÓN
+# -------------------------
+
+def versiones_aplicadas(conn) -> set:
+    _metadata.create_all(conn)
+    return set(conn.execute(select(schema_migraciones.c.version)).scalars())
+
+def _registrar(conn, version: int, nombre: str):
+    conn.execute(insert(schema_migraciones).values(
+        version=version, nombre=nombre, fecha_aplicacion=datetime.utcnow()
+    ))
+
+# [(version, nombre, aplicada)]
+def estado(bind=engine) -> list:
+    with bind.begin() as conn:
+        aplicadas = versiones_aplicadas(conn)
+    return [(version, nombre, version in aplicadas) for version, nombre, _ in sorted(MIGRACIONES)]
+
+# Aplica las migraciones pendientes, cada una en su transacción (en MySQL el
+# DDL hace commit implícito, por eso cada migración es idempotente).
+# Con una BD vacía crea el esquema de los modelos y las marca todas.
+# Devuelve [(version, nombre)] de las aplicadas.
+def migrar(bind=engine) -> list:
+    with bind.begin() as conn:
+        aplicadas = versiones_aplicadas(conn)
+        if not aplicadas and models.Usuario.__tablename__ not in inspect(conn).get_table_names():
+            Base.metadata.create_all(conn)
+            _sembrar_versiones(conn)
+            for version, nombre, _ in sorted(MIGRACIONES):
+                _registrar(conn, version, nombre)
+            return [(version, nombre) for version, nombre, _ in sorted(MIGRACIONES)]
+
+    nuevas = []
+    for version, nombre, funcion in sorted(MIGRACIONES):
+        if version in aplicadas:
+            continue
+        with bind.begin() as conn:
+            funcion(conn)
+            _registrar(conn, version, nombre)
+        nuevas.append((version, nombre))
+    return nuevas
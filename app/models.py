@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Index
+from sqlalchemy import event
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.busqueda import normalizar
 from datetime import datetime
 
 # -------------------------
@@ -17,8 +19,38 @@ class Rol(Base):
 # -------------------------
 # MODELO: USUARIO
 # -------------------------
+# Claves de búsqueda (minúsculas y sin tildes) para el autocompletado por
+# prefijo. Al insertar se calculan como valor por defecto de la columna, así
+# que también valen para los INSERT de Core (importación masiva); al
+# actualizar por el ORM las recalcula el evento before_update de abajo.
+def _clave_nombre(nombre, apellidos):
+    return normalizar(f"{nombre} {apellidos}")
+
+def _clave_apellidos(nombre, apellidos):
+    return normalizar(f"{apellidos} {nombre}")
+
+def _default_busqueda_nombre(context):
+    parametros = context.get_current_parameters()
+    return _clave_nombre(parametros["nombre"], parametros["apellidos"])
+
+def _default_busqueda_apellidos(context):
+    parametros = context.get_current_parameters()
+    return _clave_apellidos(parametros["nombre"], parametros["apellidos"])
+
+def _default_busqueda_email(context):
+    return normalizar(context.get_current_parameters()["email"])
+
 class Usuario(Base):
     __tablename__ = "usuarios"
+    # Índices creados por app.migraciones:
+    # - id_rol: listados filtrados por rol (/usuarios/solo-usuarios)
+    # - busqueda_*: autocompletado por prefijo (/usuarios/buscar)
+    __table_args__ = (
+        Index("ix_usuarios_id_rol", "id_rol"),
+        Index("ix_usuarios_busqueda_nombre", "busqueda_nombre"),
+        Index("ix_usuarios_busqueda_apellidos", "busqueda_apellidos"),
+        Index("ix_usuarios_busqueda_email", "busqueda_email"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tipo = Column(String(50), nullable=False)
@@ -30,10 +62,28 @@ class Usuario(Base):
     fecha_modificacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     habilitado = Column(Boolean, default=True)
     id_rol = Column(Integer, ForeignKey("roles.id"))
+    busqueda_nombre = Column(String(255), default=_default_busqueda_nombre)
+    busqueda_apellidos = Column(String(255), default=_default_busqueda_apellidos)
+    busqueda_email = Column(String(255), default=_default_busqueda_email)
+    # Versión de la fila (ETag de /usuarios/me), ver _incrementar_version_fila
+    version_fila = Column(Integer, nullable=False, default=0, server_default="0")
 
     rol = relationship("Rol", back_populates="usuarios")
     inscripciones = relationship("Inscripcion", back_populates="usuario")
 
+@event.listens_for(Usuario, "before_update")
+def _actualizar_busqueda_usuario(mapper, connection, usuario):
+    usuario.busqueda_nombre = _clave_nombre(usuario.nombre, usuario.apellidos)
+    usuario.busqueda_apellidos = _clave_apellidos(usuario.nombre, usuario.apellidos)
+    usuario.busqueda_email = normalizar(usuario.email)
+
+# fecha_modificacion tiene precisión de segundos en MySQL: dos cambios en el
+# mismo segundo darían el mismo ETag. version_fila sube con cada UPDATE del
+# ORM; se incrementa en SQL para que dos UPDATE a la vez no den el mismo valor.
+@event.listens_for(Usuario, "before_update")
+def _incrementar_version_fila(mapper, connection, usuario):
+    usuario.version_fila = Usuario.version_fila + 1
+
 # -------------------------
 # MODELO: CURSO
 # -------------------------
@@ -45,6 +95,9 @@ class Curso(Base):
     descripcion = Column(Text, nullable=False)
     duracion = Column(String(50), nullable=False)
     activo = Column(Boolean, default=True)  # Cambiado de "disponible" a "activo"
+    # Contadores mantenidos en las mismas transacciones que las inscripciones
+    total_inscritos = Column(Integer, nullable=False, default=0, server_default="0")
+    total_completados = Column(Integer, nullable=False, default=0, server_default="0")
 
     inscripciones = relationship("Inscripcion", back_populates="curso")
 
@@ -53,6 +106,14 @@ class Curso(Base):
 # -------------------------
 class Inscripcion(Base):
     __tablename__ = "inscripciones"
+    # Índices creados por app.migraciones (cambiarlos aquí exige una migración nueva).
+    # - (id_usuario, id_curso) único: un usuario solo puede inscribirse una vez
+    #   en cada curso; sirve también para filtrar solo por id_usuario.
+    # - id_curso: participantes de un curso y contadores.
+    __table_args__ = (
+        Index("uq_inscripciones_usuario_curso", "id_usuario", "id_curso", unique=True),
+        Index("ix_inscripciones_id_curso", "id_curso"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     id_usuario = Column(Integer, ForeignKey("usuarios.id"))
@@ -62,3 +123,35 @@ class Inscripcion(Base):
 
     usuario = relationship("Usuario", back_populates="inscripciones")
     curso = relationship("Curso", back_populates="inscripciones")
+
+# -------------------------
+# MODELO: VERSION
+# -------------------------
+# Sellos de versión de datos compartidos entre workers (p. ej. "catalogo"),
+# incrementados en la misma transacción que las escrituras
+class Version(Base):
+    __tablename__ = "versiones"
+
+    nombre = Column(String(50), primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+    fecha_modificacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# -------------------------
+# MODELO: REFRESH TOKEN
+# -------------------------
+# Solo se guarda el SHA-256 del token. Cada uso lo revoca y emite otro de la
+# misma familia (una familia = un inicio de sesión); si llega un token ya
+# revocado se revoca la familia entera.
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_familia", "familia"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    id_usuario = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    familia = Column(String(32), nullable=False)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    fecha_expiracion = Column(DateTime, nullable=False)
+    fecha_revocacion = Column(DateTime, nullable=True)
@@ -0,0 +1,78 @@
+# app/paginacion.py
+from fastapi import HTTPException
+from dotenv import load_dotenv
+import base64
+import json
+import os
+
+# -------------------------
+# CARGAR VARIABLES DE ENTORNO
+# -------------------------
+load_dotenv()
+
+# Máximo de filas del modo sin paginar (compatibilidad con el frontend actual)
+LIST_HARD_CAP = int(os.getenv("LIST_HARD_CAP", "1000"))
+# Tamaño máximo de página que se puede pedir con ?limit=
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "500"))
+
+
+# -------------------------
+# CURSOR OPACO
+# -------------------------
+def encode_cursor(ultimo_id: int, orden: str) -> str:
+    datos = json.dumps({"id": ultimo_id, "o": orden}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip("=")
+
+# Devuelve el entero guardado en el cursor (último id o posición), nunca negativo
+def decode_cursor(cursor: str, orden: str) -> int:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        ultimo_id = datos["id"]
+    except (ValueError, KeyError, TypeError, OverflowError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación no válido")
+    # El cursor lo puede escribir el cliente: solo se aceptan enteros JSON
+    # (no 1e999, "3" ni true)
+    if type(ultimo_id) is not int or ultimo_id < 0:
+        raise HTTPException(status_code=400, detail="Cursor de paginación no válido")
+    if datos.get("o") != orden:
+        raise HTTPException(status_code=400, detail="El cursor no corresponde a este orden")
+    return ultimo_id
+
+
+# -------------------------
+# PAGINACIÓN POR CLAVE (KEYSET) SOBRE EL ID
+# -------------------------
+# Sin cursor ni limit devuelve la lista de siempre (hasta LIST_HARD_CAP filas).
+# Con cualquiera de los dos devuelve {"items": [...], "next_cursor": ...}.
+def paginar(query, columna_id, cursor: str = None, limit: int = None, orden: str = "asc"):
+    descendente = orden == "desc"
+    query = query.order_by(columna_id.desc() if descendente else columna_id.asc())
+
+    if cursor is None and limit is None:
+        return query.limit(LIST_HARD_CAP).all()
+
+    limit = min(limit or PAGE_MAX_LIMIT, PAGE_MAX_LIMIT)
+    if cursor is not None:
+        ultimo_id = decode_cursor(cursor, orden)
+        query = query.filter(columna_id < ultimo_id if descendente else columna_id > ultimo_id)
+
+    # Se pide una fila de más para saber si hay página siguiente
+    filas = query.limit(limit + 1).all()
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        siguiente = encode_cursor(filas[-1].id, orden)
+    return {"items": filas, "next_cursor": siguiente}
+
+
+# -------------------------
+# PAGINACIÓN DE UNA LISTA YA CALCULADA (P. EJ. RESULTADOS POR RELEVANCIA)
+# -------------------------
+# El cursor guarda la posición; `clave` lo ata a la consulta que lo generó.
+def paginar_lista(elementos: list, cursor: str = None, limit: int = None, clave: str = ""):
+    limit = min(limit or PAGE_MAX_LIMIT, PAGE_MAX_LIMIT)
+    inicio = decode_cursor(cursor, clave) if cursor is not None else 0
+    fin = inicio + limit
+    siguiente = encode_cursor(fin, clave) if fin < len(elementos) else None
+    return {"items": elementos[inicio:fin], "next_cursor": siguiente}
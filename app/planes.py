@@ -0,0 +1,93 @@
+# app/planes.py
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+import re
+
+from app import crud, models
+from app.database import engine
+
+# -------------------------
+# CONSULTAS FRECUENTES Y TABLA QUE DEBE IR POR ÍNDICE
+# -------------------------
+# Se construyen igual que en los routers (o con el mismo constructor de
+# app.crud) con IDs de ejemplo. Uso: python -m app.cli comprobar-indices
+
+def _mis_cursos(db):
+    return select(models.Curso).join(
+        models.Inscripcion, models.Curso.id == models.Inscripcion.id_curso
+    ).where(models.Inscripcion.id_usuario == 1).order_by(models.Inscripcion.id)
+
+def _mis_inscripciones(db):
+    return crud.query_inscripciones(db, 1).order_by(models.Inscripcion.id).statement
+
+def _participantes(db):
+    return select(models.Usuario).join(
+        models.Inscripcion, models.Usuario.id == models.Inscripcion.id_usuario
+    ).where(models.Inscripcion.id_curso == 1)
+
+def _participantes_por_curso(db):
+    return select(models.Inscripcion.id_curso, models.Usuario).join(
+        models.Usuario, models.Usuario.id == models.Inscripcion.id_usuario
+    ).where(models.Inscripcion.id_curso.in_([1, 2, 3])).order_by(models.Inscripcion.id_curso, models.Inscripcion.id)
+
+# marcar_curso_completado, cancelar_inscripcion
+def _inscripcion_usuario_curso(db):
+    return select(models.Inscripcion).where(
+        models.Inscripcion.id_usuario == 1, models.Inscripcion.id_curso == 1
+    )
+
+def _solo_usuarios(db):
+    return crud.query_usuarios(db, id_rol=3).statement
+
+def _autocompletar_usuarios(db):
+    return crud.query_prefijo_usuarios(db, models.Usuario.busqueda_nombre, "ana", 10).statement
+
+CONSULTAS_FRECUENTES = [
+    ("mis_cursos", "inscripciones", _mis_cursos),
+    ("mis_inscripciones", "inscripciones", _mis_inscripciones),
+    ("obtener_participantes", "inscripciones", _participantes),
+    ("participantes_por_curso", "inscripciones", _participantes_por_curso),
+    ("completar/cancelar inscripcion", "inscripciones", _inscripcion_usuario_curso),
+    ("solo_usuarios", "usuarios", _solo_usuarios),
+    ("buscar_usuarios", "usuarios", _autocompletar_usuarios),
+]
+
+
+# -------------------------
+# EXPLAIN SEGÚN EL MOTOR
+# -------------------------
+
+# Devuelve (usa_indice, líneas del plan) para la tabla indicada
+def _explicar(conn, sql: str, tabla: str):
+    dialecto = conn.dialect.name
+
+    if dialecto == "mysql":
+        filas = conn.execute(text(f"EXPLAIN {sql}")).mappings().all()
+        lineas = [f"{fila['table']}: type={fila['type']} key={fila['key']} rows={fila['rows']}" for fila in filas]
+        propias = [fila for fila in filas if fila["table"] == tabla]
+        return bool(propias) and all(fila["key"] and fila["type"] not in ("ALL", "index") for fila in propias), lineas
+
+    if dialecto == "postgresql":
+        # Con tablas pequeñas el planificador prefiere Seq Scan aunque haya índice
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        lineas = [fila[0] for fila in conn.execute(text(f"EXPLAIN {sql}"))]
+        return not any(f"Seq Scan on {tabla}" in linea for linea in lineas), lineas
+
+    if dialecto == "sqlite":
+        lineas = [fila[3] for fila in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        return any(re.match(rf"SEARCH {tabla}\b", linea) for linea in lineas), lineas
+
+    raise ValueError(f"EXPLAIN no soportado para {dialecto}")
+
+# [(consulta, tabla, usa_indice, plan)]
+def comprobar_indices(bind=engine) -> list:
+    resultados = []
+    with bind.connect() as conn:
+        db = Session(bind=conn)
+        for nombre, tabla, construir in CONSULTAS_FRECUENTES:
+            sql = str(construir(db).compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+            with conn.begin():
+                usa_indice, plan = _explicar(conn, sql, tabla)
+            resultados.append((nombre, tabla, usa_indice, plan))
+        db.close()
+    return resultados
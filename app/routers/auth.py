@@ -3,12 +3,14 @@
 # app/routers/auth.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from app import crud, schemas
-from app.deps import get_db
+from app.deps import get_db, decode_token
 import os
 from dotenv import load_dotenv
 
@@ -18,6 +20,8 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# Vida de los refresh tokens (se renueva con cada uso)
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
 router = APIRouter(
     prefix="/auth",
@@ -37,6 +41,12 @@ def crear_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# Emitir un refresh token de una sesión nueva
+def emitir_refresh_token(db: Session, id_usuario: int) -> str:
+    token = crud.crear_refresh_token(db, id_usuario, REFRESH_TOKEN_EXPIRE_DAYS)
+    db.commit()
+    return token
+
 # Obtener el usuario autenticado a partir del token Bearer
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
@@ -45,14 +55,14 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = crud.get_usuario_by_email(db, email=email)
+    user = crud.get_principal(db, email)
     if user is None:
         raise credentials_exception
     return user
@@ -73,14 +83,15 @@ def role_required(allowed_roles: list):
 # ============================
 
 # Login API - devuelve token
+# (async para que la espera de bcrypt no ocupe un hilo del threadpool)
 @router.post("/login")
-def login_api(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+async def login_api(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await crud.authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Credenciales incorrectas")
 
     access_token = crear_token(data={"sub": user.email})
-    return {
+    respuesta = {
         "access_token": access_token,
         "token_type": "bearer",
         "id_rol": user.id_rol,  # Añadido id_rol directamente a la respuesta principal
@@ -92,19 +103,24 @@ def login_api(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = De
             "id_rol": user.id_rol
         }
     }
+    respuesta["refresh_token"] = await run_in_threadpool(emitir_refresh_token, db, user.id)
+    return respuesta
 
 # Registro de usuario API
 @router.post("/register")
-def register(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db)):
-    db_usuario = crud.get_usuario_by_email(db, usuario.email)
-    if db_usuario:
-        raise HTTPException(status_code=400, detail="El email ya está registrado")
-
+async def register(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db)):
     usuario.id_rol = 3  # Rol por defecto: usuario normal
-    nuevo_usuario = crud.create_usuario(db, usuario)
+    hashed_password = await crud.get_password_hash_async(usuario.password)
+    try:
+        nuevo_usuario = await run_in_threadpool(crud.create_usuario, db, usuario, hashed_password)
+    except IntegrityError as e:
+        raise HTTPException(
+            status_code=400,
+            detail="El email ya está registrado" if crud.es_email_duplicado(e) else "Datos de usuario no válidos (p. ej. un id_rol que no existe)"
+        )
     access_token = crear_token(data={"sub": nuevo_usuario.email})
 
-    return {
+    respuesta = {
         "message": "Usuario registrado correctamente",
         "access_token": access_token,
         "token_type": "bearer",
@@ -117,3 +133,31 @@ def register(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db)):
             "id_rol": nuevo_usuario.id_rol
         }
     }
+    respuesta["refresh_token"] = await run_in_threadpool(emitir_refresh_token, db, nuevo_usuario.id)
+    return respuesta
+
+# Renovar el access token con un refresh token (sin comprobar contraseña ni
+# usar bcrypt). El refresh token usado queda revocado y se devuelve otro.
+@router.post("/refresh")
+def refresh(datos: schemas.RefreshTokenIn, db: Session = Depends(get_db)):
+    resultado = crud.rotar_refresh_token(db, datos.refresh_token, REFRESH_TOKEN_EXPIRE_DAYS)
+    if resultado is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido o caducado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    usuario, nuevo_refresh = resultado
+    return {
+        "access_token": crear_token(data={"sub": usuario.email}),
+        "refresh_token": nuevo_refresh,
+        "token_type": "bearer",
+        "id_rol": usuario.id_rol,
+    }
+
+# Cerrar sesión: revoca el refresh token (y los emitidos a partir del mismo
+# login). El access token sigue valiendo hasta que caduca.
+@router.post("/logout")
+def logout(datos: schemas.RefreshTokenIn, db: Session = Depends(get_db)):
+    crud.revocar_refresh_token(db, datos.refresh_token)
+    return {"message": "Sesión cerrada correctamente"}
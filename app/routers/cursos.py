@@ -1,11 +1,15 @@
 # app/routers/cursos.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Dict, Any, Optional, Union, Literal
 
 from app import models, schemas, crud
-from app.database import SessionLocal
-from app.deps import get_current_user
+from app.paginacion import paginar, paginar_lista, PAGE_MAX_LIMIT
+from app.http_cache import calcular_etag, no_modificado, cabeceras_cache, respuesta_no_modificada
+from app.catalogo import catalogo_cache, contadores_cache, versiones_catalogo, indice_cursos, con_contadores
+from app.busqueda import normalizar
+from app.serializacion import serializar_agrupado, serializar_lista, serializar_paginado, respuesta_json
+from app.deps import get_current_user, get_db
 
 
 router = APIRouter(
@@ -13,26 +17,85 @@ router = APIRouter(
     tags=["Cursos"]
 )
 
-# Dependencia para obtener sesión de DB
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Obtener todos los cursos
-@router.get("/", response_model=List[schemas.CursoOut])
-def listar_cursos(db: Session = Depends(get_db)):
-    return crud.get_cursos(db)
+# Obtener todos los cursos (con ?limit= o ?cursor= devuelve una página)
+@router.get("/", response_model=Union[List[schemas.CursoOut], schemas.Pagina[schemas.CursoOut]])
+def listar_cursos(
+    request: Request,
+    activo: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    orden: Literal["asc", "desc"] = "asc",
+    db: Session = Depends(get_db)
+):
+    # Si el cliente ya tiene esta versión del catálogo (y de los contadores)
+    # se responde 304 sin consultar cursos
+    (version, version_contadores), fecha = versiones_catalogo(db)
+    etag = calcular_etag("catalogo", version, version_contadores, request.url.query)
+    if no_modificado(request, etag):
+        return respuesta_no_modificada(etag, fecha)
+
+    # Se cachea el JSON ya serializado: los aciertos no vuelven a validar ni a
+    # codificar. Incluye contadores, así que va en la caché de contadores.
+    clave = ("lista", version, request.url.query)
+    contenido = contadores_cache.get(version_contadores, clave)
+    if contenido is None:
+        cursos = paginar(crud.query_cursos(db, activo=activo), models.Curso.id, cursor, limit, orden)
+        contenido = serializar_paginado(schemas.CursoOut, cursos)
+        contadores_cache.set(version_contadores, clave, contenido)
+    return respuesta_json(contenido, cabeceras_cache(etag, fecha))
+
+# Búsqueda por relevancia en nombre y descripción, sin distinguir tildes ni
+# mayúsculas; cada término vale también como prefijo ("prog pyth").
+# Va antes de /{curso_id} para que "buscar" no se tome como un ID.
+@router.get("/buscar", response_model=schemas.Pagina[schemas.CursoOut])
+def buscar_cursos(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    activo: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=PAGE_MAX_LIMIT),
+    db: Session = Depends(get_db)
+):
+    (version, version_contadores), fecha = versiones_catalogo(db)
+    etag = calcular_etag("buscar", version, version_contadores, request.url.query)
+    if no_modificado(request, etag):
+        return respuesta_no_modificada(etag, fecha)
+
+    # El índice solo se reconstruye con el catálogo; los contadores de la
+    # página se ponen al día aparte
+    filtro = (lambda curso: curso.activo == activo) if activo is not None else None
+    resultados = indice_cursos(db).buscar(q, filtro)
+    pagina = paginar_lista(resultados, cursor, limit, clave=f"buscar:{normalizar(q)}:{activo}")
+    pagina["items"] = con_contadores(db, pagina["items"])
+    return respuesta_json(serializar_paginado(schemas.CursoOut, pagina), cabeceras_cache(etag, fecha))
+
+# Participantes de varios cursos a la vez (?ids=1&ids=2...), agrupados por curso.
+# Va antes de /{curso_id} para que "participantes" no se tome como un ID.
+@router.get("/participantes", response_model=Dict[int, List[schemas.UsuarioOut]])
+def obtener_participantes_varios(
+    ids: List[int] = Query(..., max_length=PAGE_MAX_LIMIT),
+    db: Session = Depends(get_db)
+):
+    participantes = crud.get_participantes_por_curso(db, list(dict.fromkeys(ids)))
+    return respuesta_json(serializar_agrupado(schemas.UsuarioSalida, participantes))
 
 # Obtener curso por ID
 @router.get("/{curso_id}", response_model=schemas.CursoOut)
-def obtener_curso(curso_id: int, db: Session = Depends(get_db)):
-    curso = db.query(models.Curso).filter(models.Curso.id == curso_id).first()
-    if not curso:
-        raise HTTPException(status_code=404, detail="Curso no encontrado")
-    return curso
+def obtener_curso(curso_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    (version, version_contadores), fecha = versiones_catalogo(db)
+    etag = calcular_etag("curso", curso_id, version, version_contadores)
+    if no_modificado(request, etag):
+        return respuesta_no_modificada(etag, fecha)
+
+    curso = catalogo_cache.get(version, ("curso", curso_id))
+    if curso is None:
+        curso = db.query(models.Curso).filter(models.Curso.id == curso_id).first()
+        if not curso:
+            raise HTTPException(status_code=404, detail="Curso no encontrado")
+        curso = schemas.CursoOut.model_validate(curso)
+        catalogo_cache.set(version, ("curso", curso_id), curso)
+    response.headers.update(cabeceras_cache(etag, fecha))
+    return con_contadores(db, [curso])[0]
 
 # Crear nuevo curso (solo admin o super)
 @router.post("/", response_model=schemas.CursoOut)
@@ -65,6 +128,7 @@ def editar_curso(
     curso.duracion = datos.duracion
     curso.activo = datos.activo
 
+    crud.bump_version(db, "catalogo")
     db.commit()
     db.refresh(curso)
     return curso
@@ -84,6 +148,7 @@ def eliminar_curso(
         raise HTTPException(status_code=404, detail="Curso no encontrado")
 
     db.delete(curso)
+    crud.bump_version(db, "catalogo")
     db.commit()
     return {"message": "Curso eliminado correctamente"}
 
@@ -103,10 +168,50 @@ def cambiar_estado_curso(
         raise HTTPException(status_code=404, detail="Curso no encontrado")
 
     curso.activo = estado.get("activo", curso.activo)
+    crud.bump_version(db, "catalogo")
     db.commit()
     db.refresh(curso)
     return {"message": f"Curso {'activado' if curso.activo else 'desactivado'} correctamente"}
 
+def _datos_masivos(curso_id: int, datos: schemas.InscripcionMasiva, db: Session, user):
+    if user.id_rol not in [1, 2]:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    if datos.ids_usuario is None and datos.id_rol is None:
+        raise HTTPException(status_code=400, detail="Indica ids_usuario, id_rol o ambos")
+    if not db.query(models.Curso.id).filter(models.Curso.id == curso_id).first():
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    return list(dict.fromkeys(datos.ids_usuario)) if datos.ids_usuario is not None else None
+
+# Inscribir a varios usuarios a la vez (solo admin o super). Omite a los ya inscritos.
+@router.post("/{curso_id}/inscripciones", response_model=Dict[str, Any])
+def inscribir_varios(
+    curso_id: int,
+    datos: schemas.InscripcionMasiva,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    ids_usuario = _datos_masivos(curso_id, datos, db, user)
+    resultado = crud.inscribir_en_bloque(db, curso_id, ids_usuario, datos.id_rol)
+    db.commit()
+
+    no_encontrados = len(ids_usuario) - resultado["solicitados"] if ids_usuario is not None and datos.id_rol is None else 0
+    return {"message": "Inscripción en bloque completada", "curso_id": curso_id, **resultado, "no_encontrados": no_encontrados}
+
+# Dar de baja a varios usuarios a la vez (solo admin o super)
+@router.post("/{curso_id}/inscripciones/baja", response_model=Dict[str, Any])
+def desinscribir_varios(
+    curso_id: int,
+    datos: schemas.InscripcionMasiva,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    ids_usuario = _datos_masivos(curso_id, datos, db, user)
+    resultado = crud.desinscribir_en_bloque(db, curso_id, ids_usuario, datos.id_rol)
+    db.commit()
+
+    no_encontrados = len(ids_usuario) - resultado["solicitados"] if ids_usuario is not None and datos.id_rol is None else 0
+    return {"message": "Baja en bloque completada", "curso_id": curso_id, **resultado, "no_encontrados": no_encontrados}
+
 # Obtener participantes
 @router.get("/{curso_id}/participantes", response_model=List[schemas.UsuarioOut])
 def obtener_participantes(
@@ -117,11 +222,13 @@ def obtener_participantes(
     if not curso:
         raise HTTPException(status_code=404, detail="Curso no encontrado")
     
-    usuarios = db.query(models.Usuario).join(
+    usuarios = db.query(models.Usuario).options(
+        joinedload(models.Usuario.rol)
+    ).join(
         models.Inscripcion, 
         models.Usuario.id == models.Inscripcion.id_usuario
     ).filter(
         models.Inscripcion.id_curso == curso_id
     ).all()
     
-    return usuarios
+    return respuesta_json(serializar_lista(schemas.UsuarioSalida, usuarios))
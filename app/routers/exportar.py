@@ -0,0 +1,119 @@
+# app/routers/exportar.py
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import Literal
+from datetime import datetime
+import csv
+import io
+import json
+
+from app import models, schemas
+from app.database import SessionLocal
+from app.deps import get_current_user
+
+
+router = APIRouter(
+    prefix="/exportar",
+    tags=["Exportar"]
+)
+
+# Filas que se leen de la BD en cada tanda (cursor del lado del servidor)
+FILAS_POR_TANDA = 1000
+
+# Columnas exportadas de cada tabla (nunca la contraseña)
+COLUMNAS = {
+    "usuarios": [
+        models.Usuario.id, models.Usuario.tipo, models.Usuario.nombre, models.Usuario.apellidos,
+        models.Usuario.email, models.Usuario.habilitado, models.Usuario.id_rol,
+        models.Usuario.fecha_creacion, models.Usuario.fecha_modificacion,
+    ],
+    "cursos": [
+        models.Curso.id, models.Curso.nombre, models.Curso.descripcion,
+        models.Curso.duracion, models.Curso.activo,
+    ],
+    "inscripciones": [
+        models.Inscripcion.id, models.Inscripcion.id_usuario, models.Inscripcion.id_curso,
+        models.Inscripcion.fecha_inscripcion, models.Inscripcion.completado,
+    ],
+}
+
+def _valor_json(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+# Generador que lee la tabla por tandas y va escribiendo las filas. Abre su
+# propia sesión porque se ejecuta mientras se envía la respuesta.
+def _generar_filas(tabla: str, formato: str):
+    columnas = COLUMNAS[tabla]
+    nombres = [columna.key for columna in columnas]
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(*columnas).order_by(columnas[0]).execution_options(yield_per=FILAS_POR_TANDA)
+        )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if formato == "csv":
+            writer.writerow(nombres)
+
+        for tanda in result.partitions():
+            for fila in tanda:
+                if formato == "csv":
+                    writer.writerow(fila)
+                else:
+                    buffer.write(json.dumps(
+                        {nombre: _valor_json(valor) for nombre, valor in zip(nombres, fila)},
+                        ensure_ascii=False
+                    ))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+        resto = buffer.getvalue()
+        if resto:
+            yield resto
+    finally:
+        db.close()
+
+def _respuesta_exportacion(tabla: str, formato: str):
+    media_type = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson"
+    extension = "csv" if formato == "csv" else "ndjson"
+    return StreamingResponse(
+        _generar_filas(tabla, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{tabla}.{extension}"'},
+    )
+
+def _solo_super(current_user: schemas.UsuarioOut):
+    if current_user.id_rol != 1:
+        raise HTTPException(status_code=403, detail="Acceso restringido a superadministradores")
+
+# Exportar usuarios (solo super)
+@router.get("/usuarios")
+def exportar_usuarios(
+    formato: Literal["csv", "ndjson"] = "csv",
+    current_user: schemas.UsuarioOut = Depends(get_current_user)
+):
+    _solo_super(current_user)
+    return _respuesta_exportacion("usuarios", formato)
+
+# Exportar cursos (solo super)
+@router.get("/cursos")
+def exportar_cursos(
+    formato: Literal["csv", "ndjson"] = "csv",
+    current_user: schemas.UsuarioOut = Depends(get_current_user)
+):
+    _solo_super(current_user)
+    return _respuesta_exportacion("cursos", formato)
+
+# Exportar inscripciones (solo super)
+@router.get("/inscripciones")
+def exportar_inscripciones(
+    formato: Literal["csv", "ndjson"] = "csv",
+    current_user: schemas.UsuarioOut = Depends(get_current_user)
+):
+    _solo_super(current_user)
+    return _respuesta_exportacion("inscripciones", formato)
@@ -0,0 +1,230 @@
+# app/routers/importar.py
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from typing import Literal, Optional
+from dotenv import load_dotenv
+import codecs
+import csv
+import json
+import os
+
+from app import models, schemas, crud
+from app.deps import get_current_user, get_db
+
+# -------------------------
+# CARGAR VARIABLES DE ENTORNO
+# -------------------------
+load_dotenv()
+
+# Filas por transacción (una consulta de duplicados, un executemany y un commit por tanda)
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+
+router = APIRouter(
+    prefix="/importar",
+    tags=["Importar"]
+)
+
+
+# -------------------------
+# LECTURA DEL FICHERO (EN STREAMING)
+# -------------------------
+
+def _formato(archivo: UploadFile, formato: Optional[str]) -> str:
+    if formato:
+        return formato
+    nombre = (archivo.filename or "").lower()
+    return "ndjson" if nombre.endswith((".ndjson", ".jsonl")) else "csv"
+
+ERROR_CODIFICACION = "La fila no está codificada en UTF-8"
+
+# Líneas del fichero decodificadas como UTF-8 una a una, para poder atribuir
+# un byte no válido a su línea. Las que no se pueden decodificar se apuntan
+# en `invalidas` y se entregan vacías (el lector CSV salta las líneas vacías
+# sin cambiar la numeración).
+def _lineas(archivo: UploadFile, invalidas: list):
+    for numero, linea in enumerate(archivo.file, start=1):
+        if numero == 1:
+            linea = linea.removeprefix(codecs.BOM_UTF8)
+        try:
+            yield linea.decode("utf-8")
+        except UnicodeDecodeError:
+            invalidas.append(numero)
+            yield ""
+
+def _errores_codificacion(invalidas: list):
+    while invalidas:
+        yield invalidas.pop(0), ERROR_CODIFICACION
+
+# Genera (número de línea, dict con la fila o mensaje de error) sin cargar el
+# fichero entero en memoria. En CSV las celdas vacías cuentan como ausentes
+# para que se apliquen los valores por defecto del esquema.
+def _leer_filas(archivo: UploadFile, formato: str):
+    invalidas = []
+    lineas = _lineas(archivo, invalidas)
+    if formato == "csv":
+        lector = csv.DictReader(lineas)
+        # Sin cabecera legible no se puede interpretar ninguna fila
+        if lector.fieldnames is not None and 1 in invalidas:
+            raise HTTPException(status_code=400, detail="La cabecera (línea 1) no está codificada en UTF-8")
+        for datos in lector:
+            yield from _errores_codificacion(invalidas)
+            yield lector.line_num, {clave: valor for clave, valor in datos.items() if clave and valor not in (None, "")}
+        yield from _errores_codificacion(invalidas)
+        return
+
+    for numero, linea in enumerate(lineas, start=1):
+        yield from _errores_codificacion(invalidas)
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError:
+            yield numero, "JSON no válido"
+            continue
+        yield numero, datos if isinstance(datos, dict) else "Se esperaba un objeto JSON"
+
+def _tandas(filas):
+    tanda = []
+    for fila in filas:
+        tanda.append(fila)
+        if len(tanda) >= IMPORT_CHUNK_SIZE:
+            yield tanda
+            tanda = []
+    if tanda:
+        yield tanda
+
+def _mensaje_validacion(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in detalle['loc'])}: {detalle['msg']}" for detalle in error.errors()
+    )
+
+# Valida cada fila contra el esquema; las inválidas van al informe
+def _validar(tanda, esquema, informe: schemas.InformeImportacion):
+    validas = []
+    for numero, datos in tanda:
+        if isinstance(datos, str):
+            informe.errores.append(schemas.ErrorImportacion(fila=numero, error=datos))
+            continue
+        try:
+            validas.append((numero, esquema.model_validate(datos)))
+        except ValidationError as e:
+            informe.errores.append(schemas.ErrorImportacion(fila=numero, error=_mensaje_validacion(e)))
+    return validas
+
+
+# -------------------------
+# INSERCIÓN POR TANDAS
+# -------------------------
+
+# Inserta la tanda con un único executemany y commit. Si otra petición ha
+# creado un email entre la comprobación y el INSERT, se reintenta fila a
+# fila con savepoints para saber cuáles fallan.
+def _insertar(db: Session, modelo, filas, informe: schemas.InformeImportacion, version: str = None):
+    if not filas:
+        return
+    try:
+        db.execute(insert(modelo), [valores for _, valores in filas])
+        if version:
+            crud.bump_version(db, version)
+        db.commit()
+        informe.creados += len(filas)
+        return
+    except IntegrityError:
+        db.rollback()
+
+    creados = 0
+    for numero, valores in filas:
+        try:
+            with db.begin_nested():
+                db.execute(insert(modelo), [valores])
+            creados += 1
+        except IntegrityError:
+            informe.errores.append(schemas.ErrorImportacion(fila=numero, error="Fila duplicada o con referencias no válidas"))
+    if creados and version:
+        crud.bump_version(db, version)
+    db.commit()
+    informe.creados += creados
+
+
+# Importar usuarios desde CSV o NDJSON (solo super).
+# Columnas: nombre, apellidos, email, password y opcionalmente tipo e id_rol
+# (por defecto "usuario" / 3).
+@router.post("/usuarios", response_model=schemas.InformeImportacion)
+def importar_usuarios(
+    archivo: UploadFile = File(...),
+    formato: Optional[Literal["csv", "ndjson"]] = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioOut = Depends(get_current_user)
+):
+    if current_user.id_rol != 1:
+        raise HTTPException(status_code=403, detail="Acceso restringido a superadministradores")
+
+    roles = {id_rol for (id_rol,) in db.query(models.Rol.id).all()}
+    informe = schemas.InformeImportacion(total=0, creados=0)
+    vistos = set()
+
+    for tanda in _tandas(_leer_filas(archivo, _formato(archivo, formato))):
+        informe.total += len(tanda)
+        validas = _validar(tanda, schemas.UsuarioImport, informe)
+
+        # Duplicados: dentro del propio fichero y contra la BD (una consulta por tanda)
+        registrados = crud.get_emails_registrados(db, {usuario.email for _, usuario in validas})
+        nuevas = []
+        for numero, usuario in validas:
+            if usuario.email in registrados or usuario.email in vistos:
+                informe.errores.append(schemas.ErrorImportacion(fila=numero, error="El email ya está registrado"))
+            elif usuario.id_rol not in roles:
+                informe.errores.append(schemas.ErrorImportacion(fila=numero, error=f"Rol {usuario.id_rol} no existe"))
+            else:
+                vistos.add(usuario.email)
+                nuevas.append((numero, usuario))
+
+        hashes = crud.hash_passwords([usuario.password for _, usuario in nuevas])
+        filas = [
+            (numero, {
+                "nombre": usuario.nombre,
+                "apellidos": usuario.apellidos,
+                "email": usuario.email,
+                "password": hashed_password,
+                "tipo": usuario.tipo,
+                "habilitado": True,
+                "id_rol": usuario.id_rol,
+            })
+            for (numero, usuario), hashed_password in zip(nuevas, hashes)
+        ]
+        _insertar(db, models.Usuario, filas, informe)
+
+    informe.errores.sort(key=lambda error: error.fila)
+    return informe
+
+# Importar cursos desde CSV o NDJSON (solo admin o super).
+# Columnas: nombre, descripcion, duracion y opcionalmente activo.
+@router.post("/cursos", response_model=schemas.InformeImportacion)
+def importar_cursos(
+    archivo: UploadFile = File(...),
+    formato: Optional[Literal["csv", "ndjson"]] = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioOut = Depends(get_current_user)
+):
+    if current_user.id_rol not in [1, 2]:
+        raise HTTPException(status_code=403, detail="Solo administradores o super pueden crear cursos")
+
+    informe = schemas.InformeImportacion(total=0, creados=0)
+    for tanda in _tandas(_leer_filas(archivo, _formato(archivo, formato))):
+        informe.total += len(tanda)
+        filas = [
+            (numero, {
+                "nombre": curso.nombre,
+                "descripcion": curso.descripcion,
+                "duracion": crud.normalizar_duracion(curso.duracion),
+                "activo": curso.activo if curso.activo is not None else True,
+            })
+            for numero, curso in _validar(tanda, schemas.CursoBase, informe)
+        ]
+        _insertar(db, models.Curso, filas, informe, version="catalogo")
+
+    informe.errores.sort(key=lambda error: error.fila)
+    return informe
@@ -0,0 +1,52 @@
+# app/routers/sistema.py
+from fastapi import APIRouter, Depends, HTTPException
+from anyio import to_thread
+
+from app import schemas, crud
+from app.database import engine, async_engine
+from app.deps import get_current_user, token_cache
+from app.hashing import hash_pool
+from app.catalogo import catalogo_cache, contadores_cache
+
+
+router = APIRouter(
+    prefix="/sistema",
+    tags=["Sistema"]
+)
+
+# Estadísticas del pool de conexiones (solo admin o super)
+@router.get("/pool")
+async def estadisticas_pool(current_user: schemas.UsuarioOut = Depends(get_current_user)):
+    if current_user.id_rol not in [1, 2]:
+        raise HTTPException(status_code=403, detail="No autorizado")
+
+    limiter = to_thread.current_default_thread_limiter()
+    datos = {
+        "pool": engine.pool.estadisticas(),
+        # Hilos del threadpool de Starlette (rutas síncronas) para dimensionar el pool
+        "threadpool": {
+            "total": limiter.total_tokens,
+            "en_uso": limiter.borrowed_tokens,
+        },
+        "hashing": hash_pool.stats(),
+    }
+    if async_engine is not None:
+        datos["pool_async"] = {
+            "pool_size": async_engine.pool.size(),
+            "checked_out": async_engine.pool.checkedout(),
+            "overflow": max(0, async_engine.pool.overflow()),
+        }
+    return datos
+
+# Estadísticas de las cachés en memoria de este worker (solo admin o super)
+@router.get("/caches")
+async def estadisticas_caches(current_user: schemas.UsuarioOut = Depends(get_current_user)):
+    if current_user.id_rol not in [1, 2]:
+        raise HTTPException(status_code=403, detail="No autorizado")
+
+    return {
+        "principales": crud.principal_cache.stats(),
+        "tokens": token_cache.stats(),
+        "catalogo": catalogo_cache.stats(),
+        "contadores": contadores_cache.stats(),
+    }
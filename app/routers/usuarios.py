@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union, Literal
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 
 from app import schemas, crud, models
-from app.database import SessionLocal
-from app.deps import get_current_user
+from app.deps import get_current_user, get_db
+from app.paginacion import paginar, PAGE_MAX_LIMIT
+from app.http_cache import calcular_etag, no_modificado, cabeceras_cache, respuesta_no_modificada
+from app.serializacion import serializar_lista, serializar_paginado, respuesta_json
 
 
 
@@ -15,69 +18,112 @@ from app.deps import get_current_user
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
+# Máximo de sugerencias del autocompletado
+TYPEAHEAD_MAX_LIMIT = int(os.getenv("TYPEAHEAD_MAX_LIMIT", "20"))
 
 router = APIRouter(
     prefix="/usuarios",
     tags=["Usuarios"]
 )
 
-# Dependencia para obtener la sesión de la base de datos
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Registro de nuevo usuario
 @router.post("/", response_model=schemas.UsuarioOut)
 def registrar_usuario(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db)):
-    db_usuario = crud.get_usuario_by_email(db, usuario.email)
-    if db_usuario:
+    try:
+        return crud.create_usuario(db, usuario)
+    except IntegrityError as e:
         raise HTTPException(
             status_code=400,
-            detail="El email ya está registrado"
+            detail="El email ya está registrado" if crud.es_email_duplicado(e) else "Datos de usuario no válidos (p. ej. un id_rol que no existe)"
         )
-    return crud.create_usuario(db, usuario)
 
 # Registro de nuevo administrador (ruta exclusiva)
 @router.post("/admin", response_model=schemas.UsuarioOut)
 def registrar_administrador(usuario: schemas.UsuarioCreate, db: Session = Depends(get_db)):
-    db_usuario = crud.get_usuario_by_email(db, usuario.email)
-    if db_usuario:
+    usuario.id_rol = 2  # Forzar rol de administrador
+    try:
+        return crud.create_usuario(db, usuario)
+    except IntegrityError as e:
         raise HTTPException(
             status_code=400,
-            detail="El email ya está registrado"
+            detail="El email ya está registrado" if crud.es_email_duplicado(e) else "Datos de usuario no válidos (p. ej. un id_rol que no existe)"
         )
-    usuario.id_rol = 2  # Forzar rol de administrador
-    return crud.create_usuario(db, usuario)
 
-@router.get("/", response_model=List[schemas.UsuarioOut])
+# Listados: con ?limit= o ?cursor= devuelven una página {"items", "next_cursor"}
+@router.get("/", response_model=Union[List[schemas.UsuarioOut], schemas.Pagina[schemas.UsuarioOut]])
 def listar_usuarios(
+    rol: Optional[int] = None,
+    habilitado: Optional[bool] = None,
+    tipo: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    orden: Literal["asc", "desc"] = "asc",
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioOut = Depends(get_current_user)
 ):
     if current_user.id_rol != 1:
         raise HTTPException(status_code=403, detail="Acceso restringido a superadministradores")
-    return crud.get_usuarios(db)
+    query = crud.query_usuarios(db, id_rol=rol, habilitado=habilitado, tipo=tipo)
+    usuarios = paginar(query, models.Usuario.id, cursor, limit, orden)
+    return respuesta_json(serializar_paginado(schemas.UsuarioSalida, usuarios))
 
-@router.get("/solo-usuarios", response_model=List[schemas.UsuarioOut])
+@router.get("/solo-usuarios", response_model=Union[List[schemas.UsuarioOut], schemas.Pagina[schemas.UsuarioOut]])
 def listar_usuarios_normales(
+    habilitado: Optional[bool] = None,
+    tipo: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    orden: Literal["asc", "desc"] = "asc",
+    db: Session = Depends(get_db),
+    current_user: schemas.UsuarioOut = Depends(get_current_user)
+):
+    query = crud.query_usuarios(db, id_rol=3, habilitado=habilitado, tipo=tipo)
+    usuarios = paginar(query, models.Usuario.id, cursor, limit, orden)
+    return respuesta_json(serializar_paginado(schemas.UsuarioSalida, usuarios))
+
+# Autocompletado por prefijo de nombre, apellidos o email (mismo acceso que el listado)
+@router.get("/buscar", response_model=List[schemas.UsuarioOut])
+def buscar_usuarios(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=TYPEAHEAD_MAX_LIMIT),
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioOut = Depends(get_current_user)
 ):
-    return db.query(models.Usuario).filter(models.Usuario.id_rol == 3).all()
+    if current_user.id_rol != 1:
+        raise HTTPException(status_code=403, detail="Acceso restringido a superadministradores")
+    usuarios = crud.buscar_usuarios_por_prefijo(db, q, limit)
+    return respuesta_json(serializar_lista(schemas.UsuarioSalida, usuarios))
 
 @router.get("/me", response_model=schemas.UsuarioOut)
 def leer_mi_perfil(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_user)
 ):
+    # Primero solo la versión de la fila: con un 304 no hace falta cargar más.
+    # El ETag sale de la BD, no del usuario en caché (que puede ir unos
+    # segundos por detrás de otro worker); version_fila cambia con cada
+    # UPDATE, aunque caigan dos en el mismo segundo
+    fila = db.query(models.Usuario.version_fila, models.Usuario.fecha_modificacion).filter(
+        models.Usuario.id == current_user.id
+    ).first()
+    if not fila:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    etag = calcular_etag("usuario", current_user.id, fila.version_fila)
+    if no_modificado(request, etag):
+        return respuesta_no_modificada(etag, fila.fecha_modificacion)
+
     usuario_con_rol = db.query(models.Usuario).options(
         joinedload(models.Usuario.rol)
     ).filter(models.Usuario.id == current_user.id).first()
     if not usuario_con_rol:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    # Si la fila ha cambiado entre las dos lecturas, el ETag es el de la nueva
+    if usuario_con_rol.version_fila != fila.version_fila:
+        etag = calcular_etag("usuario", usuario_con_rol.id, usuario_con_rol.version_fila)
+    response.headers.update(cabeceras_cache(etag, usuario_con_rol.fecha_modificacion))
     return usuario_con_rol
 
 @router.put("/me", response_model=schemas.UsuarioOut)
@@ -97,6 +143,7 @@ def actualizar_mi_perfil(
         if usuario_existente:
             raise HTTPException(status_code=400, detail="El email ya está registrado por otro usuario")
 
+    email_anterior = usuario_db.email
     campos_actualizables = ["nombre", "apellidos", "email", "password", "tipo", "habilitado", "id_rol"]
     for campo in campos_actualizables:
         if campo in datos_dict and datos_dict[campo] is not None:
@@ -104,10 +151,15 @@ def actualizar_mi_perfil(
                 setattr(usuario_db, campo, crud.get_password_hash(datos_dict[campo]))
             else:
                 setattr(usuario_db, campo, datos_dict[campo])
+    # Con otra contraseña, las sesiones abiertas dejan de poder renovarse
+    if datos_dict.get("password"):
+        crud.revocar_refresh_tokens_usuario(db, usuario_db.id)
 
     usuario_db.fecha_modificacion = datetime.utcnow()
+    crud.bump_version(db, "usuarios")
     db.commit()
     db.refresh(usuario_db)
+    crud.invalidar_principal(email_anterior, usuario_db.email)
 
     usuario_actualizado = db.query(models.Usuario).options(
         joinedload(models.Usuario.rol)
@@ -131,9 +183,11 @@ def actualizar_rol_usuario(
 
     usuario_db.id_rol = datos.id_rol
     usuario_db.fecha_modificacion = datetime.utcnow()
+    crud.bump_version(db, "usuarios")
 
     db.commit()
     db.refresh(usuario_db)
+    crud.invalidar_principal(usuario_db.email)
 
     return usuario_db
 
@@ -153,6 +207,7 @@ def actualizar_usuario_por_id(
 
     datos_dict = datos_actualizacion.dict(exclude_unset=True)
 
+    email_anterior = usuario_db.email
     campos_actualizables = ["nombre", "apellidos", "email", "password", "id_rol", "habilitado"]
     for campo in datos_dict:
         if campo in campos_actualizables:
@@ -160,10 +215,15 @@ def actualizar_usuario_por_id(
                 setattr(usuario_db, campo, crud.get_password_hash(datos_dict[campo]))
             else:
                 setattr(usuario_db, campo, datos_dict[campo])
+    # Con otra contraseña, las sesiones abiertas dejan de poder renovarse
+    if datos_dict.get("password"):
+        crud.revocar_refresh_tokens_usuario(db, usuario_db.id)
 
     usuario_db.fecha_modificacion = datetime.utcnow()
+    crud.bump_version(db, "usuarios")
     db.commit()
     db.refresh(usuario_db)
+    crud.invalidar_principal(email_anterior, usuario_db.email)
     return usuario_db
 
 @router.post("/inscribirse/{curso_id}", status_code=status.HTTP_201_CREATED, response_model=Dict[str, Any])
@@ -179,14 +239,6 @@ def inscribir_a_curso(
     if not curso.activo:
         raise HTTPException(status_code=400, detail="Este curso no está disponible actualmente")
 
-    inscripcion_existente = db.query(models.Inscripcion).filter(
-        models.Inscripcion.id_usuario == current_user.id,
-        models.Inscripcion.id_curso == curso_id
-    ).first()
-
-    if inscripcion_existente:
-        raise HTTPException(status_code=400, detail="Ya estás inscrito en este curso")
-
     nueva_inscripcion = models.Inscripcion(
         id_usuario=current_user.id,
         id_curso=curso_id,
@@ -194,11 +246,16 @@ def inscribir_a_curso(
         completado=False
     )
 
+    # INSERT directo: la restricción UNIQUE (id_usuario, id_curso) detecta la
+    # inscripción repetida, también con dos peticiones a la vez
     db.add(nueva_inscripcion)
-    db.commit()
-    db.refresh(nueva_inscripcion)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya estás inscrito en este curso")
 
-    return {
+    respuesta = {
         "message": "Inscripción exitosa",
         "inscripcion_id": nueva_inscripcion.id,
         "curso": {
@@ -206,27 +263,35 @@ def inscribir_a_curso(
             "nombre": curso.nombre
         }
     }
+    crud.ajustar_contadores_curso(db, curso_id, inscritos=1)
+    db.commit()
+    return respuesta
 
 @router.get("/mis-cursos", response_model=List[schemas.CursoOut])
 def mis_cursos(
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioOut = Depends(get_current_user)
 ):
-    inscripciones = db.query(models.Inscripcion).filter(
+    cursos = db.query(models.Curso).join(
+        models.Inscripcion,
+        models.Curso.id == models.Inscripcion.id_curso
+    ).filter(
         models.Inscripcion.id_usuario == current_user.id
-    ).all()
-
-    cursos = [db.query(models.Curso).filter(models.Curso.id == ins.id_curso).first() for ins in inscripciones if ins]
-    return [curso for curso in cursos if curso]
+    ).order_by(models.Inscripcion.id).all()
+    return respuesta_json(serializar_lista(schemas.CursoOut, cursos))
 
-@router.get("/mis-inscripciones", response_model=List[schemas.InscripcionOut])
+@router.get("/mis-inscripciones", response_model=Union[List[schemas.InscripcionOut], schemas.Pagina[schemas.InscripcionOut]])
 def mis_inscripciones(
+    completado: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    orden: Literal["asc", "desc"] = "asc",
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioOut = Depends(get_current_user)
 ):
-    return db.query(models.Inscripcion).filter(
-        models.Inscripcion.id_usuario == current_user.id
-    ).all()
+    query = crud.query_inscripciones(db, current_user.id, completado=completado)
+    inscripciones = paginar(query, models.Inscripcion.id, cursor, limit, orden)
+    return respuesta_json(serializar_paginado(schemas.InscripcionOut, inscripciones))
 
 @router.put("/cursos/{curso_id}/completar", response_model=Dict[str, Any])
 def marcar_curso_completado(
@@ -234,17 +299,15 @@ def marcar_curso_completado(
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioOut = Depends(get_current_user)
 ):
-    inscripcion = db.query(models.Inscripcion).filter(
-        models.Inscripcion.id_usuario == current_user.id,
-        models.Inscripcion.id_curso == curso_id
-    ).first()
-
-    if not inscripcion:
-        raise HTTPException(status_code=404, detail="No estás inscrito en este curso")
-
-    inscripcion.completado = True
+    # Si no cambia ninguna fila, o ya estaba completada o no existe
+    if not crud.completar_inscripcion(db, current_user.id, curso_id):
+        inscripcion = db.query(models.Inscripcion.id).filter(
+            models.Inscripcion.id_usuario == current_user.id,
+            models.Inscripcion.id_curso == curso_id
+        ).first()
+        if not inscripcion:
+            raise HTTPException(status_code=404, detail="No estás inscrito en este curso")
     db.commit()
-    db.refresh(inscripcion)
 
     return {"message": "Curso marcado como completado", "curso_id": curso_id}
 
@@ -254,15 +317,9 @@ def cancelar_inscripcion(
     db: Session = Depends(get_db),
     current_user: schemas.UsuarioOut = Depends(get_current_user)
 ):
-    inscripcion = db.query(models.Inscripcion).filter(
-        models.Inscripcion.id_usuario == current_user.id,
-        models.Inscripcion.id_curso == curso_id
-    ).first()
-
-    if not inscripcion:
+    # DELETE directo: de dos cancelaciones a la vez solo una borra la fila
+    if not crud.borrar_inscripciones(db, curso_id, models.Inscripcion.id_usuario == current_user.id):
         raise HTTPException(status_code=404, detail="No estás inscrito en este curso")
-
-    db.delete(inscripcion)
     db.commit()
 
     return {"message": "Inscripción cancelada correctamente", "curso_id": curso_id}
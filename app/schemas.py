@@ -1,7 +1,16 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Generic, TypeVar
 from datetime import datetime
 
+T = TypeVar("T")
+
+# -------------------------
+# PAGINACIÓN
+# -------------------------
+class Pagina(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 # -------------------------
 # ROLES
 # -------------------------
@@ -26,6 +35,8 @@ class CursoBase(BaseModel):
 
 class CursoOut(CursoBase):
     id: int
+    total_inscritos: int = 0
+    total_completados: int = 0
 
     class Config:
         from_attributes = True
@@ -36,6 +47,12 @@ class CursoConParticipantes(CursoOut):
     class Config:
         from_attributes = True
 
+# -------------------------
+# AUTENTICACIÓN
+# -------------------------
+class RefreshTokenIn(BaseModel):
+    refresh_token: str
+
 # -------------------------
 # USUARIOS
 # -------------------------
@@ -52,6 +69,12 @@ class UsuarioCreate(UsuarioBase):
 class UsuarioAdminCreate(UsuarioBase):
     password: str
 
+# Fila de una importación masiva (por defecto, alumnos)
+class UsuarioImport(UsuarioBase):
+    password: str
+    tipo: Optional[str] = "usuario"
+    id_rol: Optional[int] = 3
+
 class UsuarioUpdate(BaseModel):
     nombre: Optional[str] = None
     apellidos: Optional[str] = None
@@ -73,12 +96,30 @@ class UsuarioOut(UsuarioBase):
     class Config:
         from_attributes = True
 
+# Solo para respuestas ya construidas (app.serializacion): el email se validó
+# al guardarlo, así que basta con str. EmailStr es la mayor parte del coste
+# de validar un listado de usuarios.
+class UsuarioSalida(UsuarioOut):
+    email: str
+
 class UsuarioConCursos(UsuarioOut):
     cursos: List[CursoOut] = []
 
     class Config:
         from_attributes = True
 
+# -------------------------
+# IMPORTACIÓN MASIVA
+# -------------------------
+class ErrorImportacion(BaseModel):
+    fila: int
+    error: str
+
+class InformeImportacion(BaseModel):
+    total: int
+    creados: int
+    errores: List[ErrorImportacion] = []
+
 # -------------------------
 # INSCRIPCIONES
 # -------------------------
@@ -89,6 +130,11 @@ class InscripcionBase(BaseModel):
 class InscripcionCreate(InscripcionBase):
     pass
 
+# Inscripción o baja en bloque: por lista de ids, por rol o ambos a la vez
+class InscripcionMasiva(BaseModel):
+    ids_usuario: Optional[List[int]] = None
+    id_rol: Optional[int] = None
+
 class InscripcionOut(InscripcionBase):
     id: int
     fecha_inscripcion: datetime
@@ -0,0 +1,52 @@
+# app/serializacion.py
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from typing import Dict, List
+
+from app.schemas import Pagina
+
+
+# -------------------------
+# SERIALIZACIÓN RÁPIDA DE LISTADOS
+# -------------------------
+# Por defecto FastAPI valida el valor devuelto contra response_model, lo
+# convierte a dict/list de Python (jsonable_encoder) y después lo pasa por
+# json.dumps. En los listados grandes eso domina el tiempo de respuesta.
+# Aquí se hace una sola validación de las filas ORM contra el esquema de
+# salida (from_attributes) y pydantic-core las vuelca directamente a JSON
+# (bytes). El esquema se sigue cumpliendo: una fila que no encaja (p. ej. un
+# NULL en un campo obligatorio) lanza ValidationError igual que antes.
+# Para usuarios se usa schemas.UsuarioSalida (email: str): revalidar EmailStr
+# en cada fila costaba casi todo el tiempo y anulaba la ganancia.
+# El response_model se mantiene en las rutas para la documentación OpenAPI;
+# al devolver un Response ya construido FastAPI no lo vuelve a validar.
+
+# Un TypeAdapter por tipo (construirlo compila el validador)
+_adaptadores = {}
+
+def _adaptador(tipo) -> TypeAdapter:
+    adaptador = _adaptadores.get(tipo)
+    if adaptador is None:
+        adaptador = _adaptadores[tipo] = TypeAdapter(tipo)
+    return adaptador
+
+# Valida `datos` (filas ORM, dicts o modelos) contra `tipo` y devuelve el JSON
+def serializar(tipo, datos) -> bytes:
+    adaptador = _adaptador(tipo)
+    return adaptador.dump_json(adaptador.validate_python(datos, from_attributes=True))
+
+def serializar_lista(modelo, filas) -> bytes:
+    return serializar(List[modelo], filas)
+
+# Resultado de app.paginacion.paginar (lista o {"items", "next_cursor"})
+def serializar_paginado(modelo, resultado) -> bytes:
+    if isinstance(resultado, list):
+        return serializar_lista(modelo, resultado)
+    return serializar(Pagina[modelo], resultado)
+
+# {clave entera: [filas]} (p. ej. participantes agrupados por curso)
+def serializar_agrupado(modelo, grupos: dict) -> bytes:
+    return serializar(Dict[int, List[modelo]], grupos)
+
+def respuesta_json(contenido: bytes, headers: dict = None) -> Response:
+    return Response(content=contenido, media_type="application/json", headers=headers)
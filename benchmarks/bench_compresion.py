@@ -0,0 +1,57 @@
+# benchmarks/bench_compresion.py
+# Coste de CPU frente a bytes ahorrados al comprimir las respuestas más
+# grandes (admin.html, super.html y listados JSON) con gzip y brotli.
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/bench_compresion.py
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.compresion import brotli, comprimir
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def leer(ruta):
+    with open(os.path.join(RAIZ, ruta), "rb") as f:
+        return f.read()
+
+
+# Listado de usuarios con la forma de UsuarioOut
+def usuarios_json(n):
+    ahora = datetime(2024, 1, 1).isoformat()
+    return json.dumps([
+        {
+            "id": i, "nombre": f"Nombre{i}", "apellidos": f"Apellido{i} Apellido{i % 97}",
+            "email": f"usuario{i}@example.com", "tipo": "usuario", "id_rol": 3, "habilitado": True,
+            "fecha_creacion": ahora, "fecha_modificacion": ahora, "rol": {"id": 3, "nombre": "usuario"},
+        }
+        for i in range(n)
+    ]).encode()
+
+
+CUERPOS = {
+    "admin.html": leer("app/frontend_web/admin.html"),
+    "super.html": leer("app/frontend_web/super.html"),
+    "/usuarios/ (1k)": usuarios_json(1000),
+    "/usuarios/ (10k)": usuarios_json(10000),
+}
+
+AJUSTES = [("gzip", 1), ("gzip", 6), ("gzip", 9)]
+if brotli is not None:
+    AJUSTES += [("br", 1), ("br", 4), ("br", 11)]
+
+print(f"{'cuerpo':<18} {'códec':<8} {'original':>10} {'comprimido':>11} {'ahorro':>7} {'ms/resp':>9} {'MB/s':>8}")
+for nombre, cuerpo in CUERPOS.items():
+    for codificacion, nivel in AJUSTES:
+        repeticiones = 1 if codificacion == "br" and nivel == 11 else 20
+        comprimido = comprimir(codificacion, cuerpo, nivel, nivel)
+        segundos = timeit.timeit(lambda: comprimir(codificacion, cuerpo, nivel, nivel), number=repeticiones) / repeticiones
+        ahorro = 1 - len(comprimido) / len(cuerpo)
+        print(f"{nombre:<18} {codificacion + '-' + str(nivel):<8} {len(cuerpo):>10} {len(comprimido):>11} "
+              f"{ahorro:>6.1%} {segundos * 1000:>9.2f} {len(cuerpo) / segundos / 1e6:>8.1f}")
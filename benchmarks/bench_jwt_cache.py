@@ -0,0 +1,28 @@
+# benchmarks/bench_jwt_cache.py
+# Compara el coste por petición de verificar el JWT con jwt.decode frente a
+# la caché de claims de app.deps.decode_token.
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/bench_jwt_cache.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt
+from app.deps import decode_token, token_cache, SECRET_KEY, ALGORITHM
+from app.routers.auth import crear_token
+
+N = 20000
+
+token = crear_token({"sub": "benchmark@example.com"})
+
+sin_cache = timeit.timeit(lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), number=N)
+decode_token(token)  # calentar la caché
+con_cache = timeit.timeit(lambda: decode_token(token), number=N)
+
+print(f"jwt.decode:    {sin_cache / N * 1e6:8.2f} us/petición")
+print(f"decode_token:  {con_cache / N * 1e6:8.2f} us/petición")
+print(f"ahorro:        {(sin_cache - con_cache) / N * 1e6:8.2f} us/petición ({sin_cache / con_cache:.1f}x)")
+print(f"caché:         {token_cache.stats()}")
@@ -0,0 +1,95 @@
+# benchmarks/bench_serializacion.py
+# Serialización de listados de usuarios (UsuarioOut con RolOut anidado):
+# camino de FastAPI (validar contra response_model + jsonable_encoder +
+# json.dumps) frente a app.serializacion (una sola validación desde los
+# atributos ORM contra UsuarioSalida, con el email como str, + volcado a JSON
+# con pydantic-core).
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/bench_serializacion.py
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, joinedload
+
+from app import models, schemas
+from app.database import Base
+
+from app.serializacion import serializar_lista
+
+TAMANOS = [1000, 10000, 100000]
+
+engine = create_engine("sqlite://")
+Base.metadata.create_all(engine)
+Session = sessionmaker(bind=engine)
+
+
+def poblar(n):
+    db = Session()
+    db.query(models.Usuario).delete()
+    if not db.query(models.Rol).count():
+        db.add_all([models.Rol(id=1, nombre="super"), models.Rol(id=2, nombre="admin"), models.Rol(id=3, nombre="usuario")])
+    ahora = datetime(2024, 1, 1)
+    db.execute(models.Usuario.__table__.insert(), [
+        {
+            "id": i + 1, "tipo": "usuario", "nombre": f"Nombre{i}", "apellidos": f"Apellido{i}",
+            "email": f"usuario{i}@example.com", "password": "x", "habilitado": True, "id_rol": 3,
+            "fecha_creacion": ahora, "fecha_modificacion": ahora,
+        }
+        for i in range(n)
+    ])
+    db.commit()
+    db.close()
+
+
+def cargar():
+    db = Session()
+    filas = db.query(models.Usuario).options(joinedload(models.Usuario.rol)).order_by(models.Usuario.id).all()
+    return db, filas
+
+
+campo = create_model_field(name="respuesta", type_=List[schemas.UsuarioOut], mode="serialization")
+
+
+# Lo que hace FastAPI con un valor devuelto y response_model
+def camino_actual(filas) -> bytes:
+    contenido = asyncio.run(serialize_response(field=campo, response_content=filas, is_coroutine=False))
+    return JSONResponse(contenido).body
+
+
+def camino_rapido(filas) -> bytes:
+    return serializar_lista(schemas.UsuarioSalida, filas)
+
+
+def medir(funcion, filas, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(filas)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+print(f"{'filas':>8} {'actual ms':>10} {'rápido ms':>10} {'mejora':>7} {'bytes':>11}")
+for n in TAMANOS:
+    poblar(n)
+    db, filas = cargar()
+    assert json.loads(camino_actual(filas)) == json.loads(camino_rapido(filas))
+    repeticiones = 5 if n <= 10000 else 1
+    actual = medir(camino_actual, filas, repeticiones)
+    rapido = medir(camino_rapido, filas, repeticiones)
+    print(f"{n:>8} {actual * 1000:>10.1f} {rapido * 1000:>10.1f} "
+          f"{actual / rapido:>6.1f}x {len(camino_rapido(filas)):>11}")
+    db.close()
@@ -1,13 +1,20 @@
 # app/main.py
 from fastapi import FastAPI, Request, Depends, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
 
-from app.routers import auth, usuarios, cursos  # 👈 ¡sin superadmin!
+from app.routers import auth, usuarios, cursos, sistema, exportar, importar  # 👈 ¡sin superadmin!
 from app.deps import get_current_user
+from app.hashing import HashPoolSaturado
+from app.database import QUERY_BUDGET, SessionLocal
+from app.metricas import contar_consultas_peticion
+from app.assets import AssetPipeline, AssetStaticFiles
+from app.compresion import CompresionMiddleware
+from app.catalogo import fragmento_catalogo
+from app import crud
 
 
 
@@ -24,6 +31,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# =========================
+# COMPRESIÓN DE RESPUESTAS (br/gzip, configurable desde .env)
+# =========================
+app.add_middleware(CompresionMiddleware)
+
 # =========================
 # MIDDLEWARE PARA MANEJAR ERRORES DE AUTENTICACIÓN
 # =========================
@@ -38,24 +50,85 @@ async def handle_auth_exceptions(request: Request, call_next):
             return RedirectResponse(url=f"/login?next={request.url.path}", status_code=302)
         raise e
 
+# =========================
+# PRESUPUESTO DE CONSULTAS POR PETICIÓN (QUERY_BUDGET en .env)
+# =========================
+if QUERY_BUDGET > 0:
+    @app.middleware("http")
+    async def query_budget(request: Request, call_next):
+        with contar_consultas_peticion() as contador:
+            response = await call_next(request)
+        response.headers["X-Query-Count"] = str(contador.total)
+        if contador.total > QUERY_BUDGET:
+            print(f"Aviso: {request.method} {request.url.path} ejecutó {contador.total} consultas (presupuesto {QUERY_BUDGET})")
+        return response
+
+# =========================
+# POOL DE HASHING SATURADO
+# =========================
+# Si bcrypt no da abasto se rechaza al momento en vez de encolar sin límite
+@app.exception_handler(HashPoolSaturado)
+async def handle_hash_pool_saturado(request: Request, exc: HashPoolSaturado):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, inténtalo de nuevo en unos segundos"},
+        headers={"Retry-After": "1"},
+    )
+
 # =========================
 # ARCHIVOS ESTÁTICOS Y TEMPLATES
 # =========================
-app.mount("/static", StaticFiles(directory="app/frontend_web"), name="static")
+# Al arrancar se calcula la huella de cada fichero y se precomprimen (gzip/br).
+# Las URLs con huella se sirven con Cache-Control: immutable.
+assets = AssetPipeline("app/frontend_web").construir()
+app.mount("/static", AssetStaticFiles(directory="app/frontend_web", pipeline=assets), name="static")
 templates = Jinja2Templates(directory="app/frontend_web")
+templates.env.globals["static_url"] = assets.url
 
 # =========================
 # PÁGINAS HTML
 # =========================
 
+# =========================
+# CATÁLOGO RENDERIZADO EN EL SERVIDOR
+# =========================
+# Los fragmentos se cachean por versión del catálogo (app.catalogo): mientras
+# no cambien los cursos, la portada no consulta la base de datos (salvo la
+# comprobación periódica del sello de versión).
+
+# Tarjetas de la portada (los 6 primeros cursos, igual que el JS)
+def render_cursos_destacados():
+    db = SessionLocal()
+    try:
+        return fragmento_catalogo(db, "destacados", lambda cursos: templates.get_template(
+            "fragmentos/cursos_destacados.html"
+        ).render(cursos=cursos[:6]), contadores=True)
+    finally:
+        db.close()
+
+# Tarjetas de /mis-cursos: una consulta para los IDs del usuario y cada
+# tarjeta sale de la caché de fragmentos
+def render_mis_cursos(usuario_id: int):
+    db = SessionLocal()
+    try:
+        tarjetas = []
+        for curso_id in crud.get_ids_cursos_inscritos(db, usuario_id):
+            tarjetas.append(fragmento_catalogo(db, ("mi_curso", curso_id), lambda cursos, curso_id=curso_id: "".join(
+                templates.get_template("fragmentos/tarjeta_mi_curso.html").render(curso=curso)
+                for curso in cursos if curso.id == curso_id
+            )))
+        return "".join(tarjetas)
+    finally:
+        db.close()
+
 # ✅ Home no necesita autenticación obligatoria
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse("index.html", {"request": request, "cursos_html": render_cursos_destacados()})
 
 @app.get("/inicio", response_class=HTMLResponse)
 def inicio_page(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse("index.html", {"request": request, "cursos_html": render_cursos_destacados()})
 
 @app.get("/login", response_class=HTMLResponse)
 def login_page(request: Request):
@@ -175,7 +248,13 @@ async def perfil_post(request: Request):
 async def mis_cursos_page(request: Request):
     try:
         current_user = await get_current_user(request)
-        return templates.TemplateResponse("mis-cursos.html", {"request": request, "user": current_user})
+        mis_cursos_html = await run_in_threadpool(render_mis_cursos, current_user.id)
+        return templates.TemplateResponse("mis-cursos.html", {
+            "request": request,
+            "user": current_user,
+            "ssr": True,
+            "mis_cursos_html": mis_cursos_html,
+        })
     except HTTPException:
         return RedirectResponse(url="/login?next=/mis-cursos")
 
@@ -239,3 +318,6 @@ async def auth_check(request: Request):
 app.include_router(auth.router)
 app.include_router(usuarios.router)
 app.include_router(cursos.router)
+app.include_router(sistema.router)
+app.include_router(exportar.router)
+app.include_router(importar.router)
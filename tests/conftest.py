@@ -0,0 +1,70 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# La configuración se lee al importar app.database, así que va antes de
+# cualquier import de la aplicación (load_dotenv no pisa lo ya definido).
+# Intervalos de sello largos: la comprobación periódica de versiones no debe
+# sumar consultas en mitad de una medición.
+_directorio = tempfile.mkdtemp(prefix="academia-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directorio, 'tests.sqlite')}"
+os.environ["DB_ECHO"] = "false"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["CATALOG_POLL_INTERVAL"] = "3600"
+os.environ["PRINCIPAL_POLL_INTERVAL"] = "3600"
+os.environ.setdefault("SECRET_KEY", "clave-de-tests")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud, migraciones, models, schemas
+from app.database import SessionLocal
+
+
+# Datos de ejemplo: varios roles, usuarios y cursos para que una carga perezosa
+# por fila (N+1) se note en el número de consultas
+@pytest.fixture(scope="session")
+def datos():
+    migraciones.migrar()
+    db = SessionLocal()
+    db.add_all([models.Rol(id=1, nombre="super"), models.Rol(id=2, nombre="admin"), models.Rol(id=3, nombre="usuario")])
+    db.commit()
+
+    usuarios = [
+        crud.create_usuario(db, schemas.UsuarioCreate(
+            nombre=f"Nombre{i}", apellidos=f"Apellido{i}", email=f"usuario{i}@example.com",
+            password="secreto", tipo="usuario", id_rol=1 if i == 0 else 2 if i < 3 else 3
+        ))
+        for i in range(8)
+    ]
+    cursos = [
+        crud.create_curso(db, schemas.CursoBase(nombre=f"Curso {i}", descripcion="Descripción", duracion="4"))
+        for i in range(4)
+    ]
+    for usuario in usuarios:
+        for curso in cursos:
+            db.add(models.Inscripcion(id_usuario=usuario.id, id_curso=curso.id, completado=False))
+    db.commit()
+    ids = {"super": usuarios[0].id, "cursos": [curso.id for curso in cursos]}
+    db.close()
+    return ids
+
+@pytest.fixture(scope="session")
+def client(datos):
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+# Cabeceras del superadministrador (usuario0), con su usuario ya en la caché
+# de principales para que la autenticación no cuente en las mediciones
+@pytest.fixture(scope="session")
+def auth_super(client):
+    respuesta = client.post("/auth/login", data={"username": "usuario0@example.com", "password": "secreto"})
+    cabeceras = {"Authorization": f"Bearer {respuesta.json()['access_token']}"}
+    assert client.get("/usuarios/me", headers=cabeceras).status_code == 200
+    return cabeceras
@@ -0,0 +1,195 @@
+# tests/test_contadores.py
+# Contadores de cursos (total_inscritos / total_completados): cada escritura
+# los ajusta según las filas que cambia de verdad, así que deben coincidir
+# siempre con la tabla inscripciones, también con peticiones a la vez.
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import func
+
+from app import crud, models, schemas
+from app.database import SessionLocal
+
+_numero = itertools.count()
+
+
+@pytest.fixture
+def curso_id(datos):
+    db = SessionLocal()
+    try:
+        curso = crud.create_curso(db, schemas.CursoBase(
+            nombre=f"Contadores {next(_numero)}", descripcion="Descripción", duracion="4"
+        ))
+        return curso.id
+    finally:
+        db.close()
+
+# Solo alumnos de conftest (usuario3..usuario7): las medidas de
+# test_presupuesto_consultas cuentan los cursos del superadministrador
+@pytest.fixture(scope="module")
+def ids_usuarios(datos):
+    db = SessionLocal()
+    try:
+        return [id_usuario for (id_usuario,) in db.query(models.Usuario.id).filter(
+            models.Usuario.email.like("usuario%@example.com"), models.Usuario.id_rol == 3
+        ).order_by(models.Usuario.id)]
+    finally:
+        db.close()
+
+# Cabeceras de usuarioN (contraseña de conftest)
+@pytest.fixture(scope="module")
+def auth_usuario(client):
+    def cabeceras(numero: int):
+        respuesta = client.post("/auth/login", data={"username": f"usuario{numero}@example.com", "password": "secreto"})
+        return {"Authorization": f"Bearer {respuesta.json()['access_token']}"}
+    return cabeceras
+
+# (total_inscritos, total_completados) guardados en el curso
+def _contadores(curso_id: int):
+    db = SessionLocal()
+    try:
+        curso = db.get(models.Curso, curso_id)
+        return curso.total_inscritos, curso.total_completados
+    finally:
+        db.close()
+
+# Los mismos totales contados en la tabla inscripciones
+def _reales(curso_id: int):
+    db = SessionLocal()
+    try:
+        inscritos = db.query(func.count(models.Inscripcion.id)).filter(models.Inscripcion.id_curso == curso_id).scalar()
+        completados = db.query(func.count(models.Inscripcion.id)).filter(
+            models.Inscripcion.id_curso == curso_id, models.Inscripcion.completado == True
+        ).scalar()
+        return inscritos, completados
+    finally:
+        db.close()
+
+def _en_paralelo(funcion, argumentos, hilos: int = 8):
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        return list(pool.map(funcion, argumentos))
+
+
+def test_inscribir_completar_y_cancelar(client, curso_id, auth_usuario):
+    cabeceras = auth_usuario(4)
+    assert client.post(f"/usuarios/inscribirse/{curso_id}", headers=cabeceras).status_code == 201
+    assert client.post(f"/usuarios/inscribirse/{curso_id}", headers=cabeceras).status_code == 400
+    assert _contadores(curso_id) == (1, 0)
+
+    assert client.put(f"/usuarios/cursos/{curso_id}/completar", headers=cabeceras).status_code == 200
+    assert client.put(f"/usuarios/cursos/{curso_id}/completar", headers=cabeceras).status_code == 200
+    assert _contadores(curso_id) == (1, 1)
+
+    # La caché de contadores se invalida con la escritura
+    curso = client.get(f"/cursos/{curso_id}").json()
+    assert (curso["total_inscritos"], curso["total_completados"]) == (1, 1)
+
+    assert client.delete(f"/usuarios/cursos/{curso_id}/inscripcion", headers=cabeceras).status_code == 200
+    assert client.delete(f"/usuarios/cursos/{curso_id}/inscripcion", headers=cabeceras).status_code == 404
+    assert _contadores(curso_id) == (0, 0)
+
+def test_las_escrituras_publican_el_sello_de_contadores(client, curso_id, auth_usuario):
+    db = SessionLocal()
+    try:
+        antes, _ = crud.get_version(db, "contadores")
+    finally:
+        db.close()
+    client.post(f"/usuarios/inscribirse/{curso_id}", headers=auth_usuario(5))
+    db = SessionLocal()
+    try:
+        assert crud.get_version(db, "contadores")[0] == antes + 1
+    finally:
+        db.close()
+
+def test_altas_y_bajas_en_bloque(client, auth_super, curso_id, ids_usuarios):
+    url = f"/cursos/{curso_id}/inscripciones"
+    respuesta = client.post(url, json={"ids_usuario": ids_usuarios[:5]}, headers=auth_super).json()
+    assert (respuesta["inscritos"], respuesta["ya_inscritos"]) == (5, 0)
+    respuesta = client.post(url, json={"ids_usuario": ids_usuarios}, headers=auth_super).json()
+    assert (respuesta["inscritos"], respuesta["ya_inscritos"]) == (len(ids_usuarios) - 5, 5)
+    assert _contadores(curso_id) == (len(ids_usuarios), 0)
+
+    db = SessionLocal()
+    try:
+        for id_usuario in ids_usuarios[:3]:
+            crud.completar_inscripcion(db, id_usuario, curso_id)
+        db.commit()
+    finally:
+        db.close()
+    assert _contadores(curso_id) == (len(ids_usuarios), 3)
+
+    # Baja de dos completados y dos sin completar
+    respuesta = client.post(f"{url}/baja", json={"ids_usuario": ids_usuarios[1:5]}, headers=auth_super).json()
+    assert respuesta["dados_de_baja"] == 4
+    assert _contadores(curso_id) == _reales(curso_id) == (len(ids_usuarios) - 4, 1)
+
+def test_completar_a_la_vez_cuenta_una_vez(curso_id, ids_usuarios):
+    id_usuario = ids_usuarios[0]
+    db = SessionLocal()
+    try:
+        crud.inscribir_en_bloque(db, curso_id, [id_usuario])
+        db.commit()
+    finally:
+        db.close()
+
+    def completar(_):
+        db = SessionLocal()
+        try:
+            cambiadas = crud.completar_inscripcion(db, id_usuario, curso_id)
+            db.commit()
+            return cambiadas
+        finally:
+            db.close()
+
+    assert sum(_en_paralelo(completar, range(8))) == 1
+    assert _contadores(curso_id) == (1, 1)
+
+def test_cancelar_a_la_vez_cuenta_una_vez(curso_id, ids_usuarios):
+    id_usuario = ids_usuarios[0]
+    db = SessionLocal()
+    try:
+        crud.inscribir_en_bloque(db, curso_id, [id_usuario])
+        crud.completar_inscripcion(db, id_usuario, curso_id)
+        db.commit()
+    finally:
+        db.close()
+
+    def cancelar(_):
+        db = SessionLocal()
+        try:
+            borradas = crud.borrar_inscripciones(db, curso_id, models.Inscripcion.id_usuario == id_usuario)
+            db.commit()
+            return borradas
+        finally:
+            db.close()
+
+    assert sum(_en_paralelo(cancelar, range(8))) == 1
+    assert _contadores(curso_id) == (0, 0)
+
+def test_bloque_e_individuales_a_la_vez(curso_id, ids_usuarios):
+    # Altas en bloque que se solapan entre sí y con altas sueltas: ninguna
+    # falla por el índice único y los contadores cuadran con la tabla
+    def inscribir(ids):
+        db = SessionLocal()
+        try:
+            resultado = crud.inscribir_en_bloque(db, curso_id, ids)
+            db.commit()
+            return resultado["inscritos"]
+        finally:
+            db.close()
+
+    lotes = [ids_usuarios, ids_usuarios[::2], ids_usuarios[1::2]] + [[id_usuario] for id_usuario in ids_usuarios]
+    assert sum(_en_paralelo(inscribir, lotes)) == len(ids_usuarios)
+    assert _contadores(curso_id) == _reales(curso_id) == (len(ids_usuarios), 0)
+
+def test_reconciliar_no_cambia_contadores_correctos(curso_id, ids_usuarios):
+    db = SessionLocal()
+    try:
+        crud.inscribir_en_bloque(db, curso_id, ids_usuarios[:3])
+        crud.completar_inscripcion(db, ids_usuarios[0], curso_id)
+        db.commit()
+        crud.reconciliar_contadores(db)
+    finally:
+        db.close()
+    assert _contadores(curso_id) == _reales(curso_id) == (3, 1)
@@ -0,0 +1,53 @@
+# tests/test_paginacion.py
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.paginacion import decode_cursor, encode_cursor, paginar_lista
+
+
+def _cursor(texto: str) -> str:
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+def test_cursor_ida_y_vuelta():
+    assert decode_cursor(encode_cursor(42, "asc"), "asc") == 42
+
+@pytest.mark.parametrize("cursor", [
+    _cursor('{"id":1e999,"o":"asc"}'),
+    _cursor('{"id":1.5,"o":"asc"}'),
+    _cursor('{"id":"3","o":"asc"}'),
+    _cursor('{"id":true,"o":"asc"}'),
+    _cursor('{"id":-1,"o":"asc"}'),
+    _cursor('[1]'),
+    _cursor('no es json'),
+    "%%%",
+])
+def test_cursor_no_valido(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "asc")
+    assert error.value.status_code == 400
+
+def test_cursor_de_otro_orden():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(encode_cursor(1, "asc"), "desc")
+    assert error.value.status_code == 400
+
+def test_paginar_lista_rechaza_posicion_negativa():
+    with pytest.raises(HTTPException):
+        paginar_lista(list(range(10)), _cursor(json.dumps({"id": -3, "o": "q"})), 2, clave="q")
+
+def test_paginar_lista_recorre_todo():
+    elementos, cursor, vistos = list(range(7)), None, []
+    while True:
+        pagina = paginar_lista(elementos, cursor, 3, clave="q")
+        vistos += pagina["items"]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+    assert vistos == elementos
+
+def test_cursor_desbordado_en_la_api(client):
+    respuesta = client.get("/cursos/", params={"cursor": _cursor('{"id":1e999,"o":"asc"}')})
+    assert respuesta.status_code == 400
@@ -0,0 +1,50 @@
+# tests/test_presupuesto_consultas.py
+# Presupuesto de sentencias SQL por ruta: si una ruta vuelve a cargar
+# relaciones fila a fila (N+1), el número de consultas crece con los datos
+# y el test falla. La autenticación no cuenta: el usuario ya está en la
+# caché de principales (fixture auth_super).
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import engine
+from app.metricas import max_consultas
+
+
+# Una consulta: cursos JOIN inscripciones
+def test_mis_cursos(client, auth_super, datos):
+    with max_consultas(engine, 1):
+        respuesta = client.get("/usuarios/mis-cursos", headers=auth_super)
+    assert respuesta.status_code == 200
+    assert len(respuesta.json()) == len(datos["cursos"])
+
+# Una consulta: usuarios con el rol en el mismo SELECT (joinedload)
+@pytest.mark.parametrize("parametros", ["", "?limit=3", "?rol=3", "?orden=desc&limit=2"])
+def test_listar_usuarios(client, auth_super, parametros):
+    with max_consultas(engine, 1):
+        respuesta = client.get(f"/usuarios/{parametros}", headers=auth_super)
+    assert respuesta.status_code == 200
+
+# Dos consultas: existencia del curso y participantes con su rol
+def test_participantes(client, auth_super, datos):
+    with max_consultas(engine, 2):
+        respuesta = client.get(f"/cursos/{datos['cursos'][0]}/participantes", headers=auth_super)
+    assert respuesta.status_code == 200
+    assert all(usuario["rol"] is not None for usuario in respuesta.json())
+
+# El propio helper: cargar el rol de cada usuario por separado supera el presupuesto
+def test_max_consultas_detecta_n_mas_1(datos):
+    with pytest.raises(AssertionError, match="consultas"):
+        with max_consultas(engine, 1):
+            with Session(engine) as db:
+                for usuario in db.query(models.Usuario).all():
+                    usuario.rol.nombre
+
+# Una consulta para el 304 (solo la versión de la fila), dos con el perfil completo
+def test_perfil_no_modificado(client, auth_super):
+    with max_consultas(engine, 2):
+        respuesta = client.get("/usuarios/me", headers=auth_super)
+    assert respuesta.status_code == 200
+    with max_consultas(engine, 1):
+        respuesta = client.get("/usuarios/me", headers={**auth_super, "If-None-Match": respuesta.headers["ETag"]})
+    assert respuesta.status_code == 304
@@ -0,0 +1,95 @@
+# tests/test_refresh_tokens.py
+# Rotación de refresh tokens: cada uso revoca el token y emite otro de la
+# misma familia; reutilizar uno ya usado cierra toda la familia.
+import itertools
+
+from app import crud, models
+from app.database import SessionLocal
+
+_numero = itertools.count()
+
+
+# Usuario nuevo por test (las sesiones de uno no afectan a otro)
+def _registrar(client):
+    email = f"refresh{next(_numero)}@example.com"
+    respuesta = client.post("/auth/register", json={
+        "nombre": "Nombre", "apellidos": "Apellidos", "email": email, "password": "secreto"
+    })
+    assert respuesta.status_code == 200
+    return email, respuesta.json()
+
+def _renovar(client, refresh_token):
+    return client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+def _tokens_familia(refresh_token):
+    db = SessionLocal()
+    try:
+        actual = db.query(models.RefreshToken).filter(
+            models.RefreshToken.token_hash == crud._hash_refresh_token(refresh_token)
+        ).first()
+        return db.query(models.RefreshToken).filter(models.RefreshToken.familia == actual.familia).all()
+    finally:
+        db.close()
+
+
+def test_rotacion(client):
+    _, sesion = _registrar(client)
+    respuesta = _renovar(client, sesion["refresh_token"])
+    assert respuesta.status_code == 200
+    nuevo = respuesta.json()["refresh_token"]
+    assert nuevo != sesion["refresh_token"]
+    assert _renovar(client, nuevo).status_code == 200
+
+def test_reutilizar_un_token_revoca_la_familia(client):
+    _, sesion = _registrar(client)
+    robado = sesion["refresh_token"]
+    legitimo = _renovar(client, robado).json()["refresh_token"]
+
+    # El token ya rotado vuelve a usarse: se rechaza y cae también el vigente
+    assert _renovar(client, robado).status_code == 401
+    assert _renovar(client, legitimo).status_code == 401
+    assert all(token.fecha_revocacion is not None for token in _tokens_familia(legitimo))
+
+def test_la_reutilizacion_no_afecta_a_otras_sesiones(client):
+    email, sesion = _registrar(client)
+    otra = client.post("/auth/login", data={"username": email, "password": "secreto"}).json()
+    _renovar(client, sesion["refresh_token"])
+    assert _renovar(client, sesion["refresh_token"]).status_code == 401
+    assert _renovar(client, otra["refresh_token"]).status_code == 200
+
+def test_logout_revoca_la_familia(client):
+    _, sesion = _registrar(client)
+    nuevo = _renovar(client, sesion["refresh_token"]).json()["refresh_token"]
+    assert client.post("/auth/logout", json={"refresh_token": sesion["refresh_token"]}).status_code == 200
+    assert _renovar(client, nuevo).status_code == 401
+
+def test_cambiar_password_revoca_todas_las_sesiones(client):
+    email, sesion = _registrar(client)
+    otra = client.post("/auth/login", data={"username": email, "password": "secreto"}).json()
+    cabeceras = {"Authorization": f"Bearer {sesion['access_token']}"}
+    assert client.put("/usuarios/me", json={"password": "otro-secreto"}, headers=cabeceras).status_code == 200
+
+    assert _renovar(client, sesion["refresh_token"]).status_code == 401
+    assert _renovar(client, otra["refresh_token"]).status_code == 401
+
+def test_usuario_deshabilitado_no_renueva(client, auth_super):
+    _, sesion = _registrar(client)
+    respuesta = client.put(f"/usuarios/{sesion['usuario']['id']}", json={"habilitado": False}, headers=auth_super)
+    assert respuesta.status_code == 200
+    assert _renovar(client, sesion["refresh_token"]).status_code == 401
+
+def test_purgar_conserva_las_familias_vivas(client):
+    _, cerrada = _registrar(client)
+    client.post("/auth/logout", json={"refresh_token": cerrada["refresh_token"]})
+    _, viva = _registrar(client)
+    vigente = _renovar(client, viva["refresh_token"]).json()["refresh_token"]
+
+    db = SessionLocal()
+    try:
+        assert crud.purgar_refresh_tokens(db) >= 1
+    finally:
+        db.close()
+    # El token rotado de la familia viva sigue ahí para detectar su reutilización
+    assert len(_tokens_familia(vigente)) == 2
+    assert _renovar(client, viva["refresh_token"]).status_code == 401
+    assert _renovar(client, cerrada["refresh_token"]).status_code == 401